@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+import time
+import threading
+import contextlib
+import psycopg2
+import psycopg2.pool
+import psycopg2.extensions
+
+"""
+PDL2Twitter_db_funcs.py - Functions used in PDL2Twitter to access the
+                          database through a pool of connections that heals
+                          itself.  A connection that was lost is replaced
+                          and the statement retried with backoff, so a
+                          database restart doesn't take PDL2Twitter down
+                          with it.  The hot statements are prepared on the
+                          server once per connection, and every statement
+                          has a timeout.
+"""
+
+# database errors worth retrying - a lost connection, the database
+# restarting, a statement timeout
+RETRY_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def execute_prepared(cur, name, query, params=None):
+    """
+    Runs a statement prepared on the server as name, preparing it first if
+    the cursor's connection (a PooledConnection) hasn't yet.  The query
+    uses $1, $2, ... for the params.
+    """
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute('PREPARE ' + name + ' AS ' + query)
+        conn.prepared.add(name)
+    if params:
+        placeholders = ', '.join(['%s'] * len(params))
+        cur.execute('EXECUTE ' + name + ' (' + placeholders + ')', params)
+    else:
+        cur.execute('EXECUTE ' + name)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    A connection (autocommit) that remembers the statements prepared on it
+    and when it was last used
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PooledConnection, self).__init__(*args, **kwargs)
+        # before any statement - the health check mustn't open a transaction
+        self.autocommit = True
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+class Database(object):
+    """
+    A pool of pool_size connections (autocommit), shared by the threads of
+    the program.  They are opened at the start (raising psycopg2.Error if
+    the database can't be reached), and a connection that's lost is opened
+    again when it's next needed.  A connection idle for more than
+    health_check_interval seconds is checked before it's handed out, and
+    replaced if the check fails.
+    db_dict: the [DATABASE] section (name, user, port, ip, password)
+    logger: logger object
+    pool_size: int, most connections open at once
+    statement_timeout_ms: int, longest a statement may run (0 for no limit)
+    health_check_interval: float, seconds
+    max_backoff: float, longest wait between two attempts, in seconds
+    """
+
+    def __init__(self, db_dict, logger, pool_size, statement_timeout_ms,
+                 health_check_interval, max_backoff):
+        self.logger = logger
+        self.health_check_interval = health_check_interval
+        self.max_backoff = max_backoff
+        options = '-c statement_timeout={}'.format(statement_timeout_ms)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(pool_size, pool_size,
+                                                         dbname = db_dict['name'],
+                                                         user = db_dict['user'],
+                                                         port = db_dict['port'],
+                                                         host = db_dict['ip'],
+                                                         password = db_dict['password'],
+                                                         options = options,
+                                                         connection_factory = PooledConnection)
+        # the pool raises an error when it's exhausted - wait instead
+        self.slots = threading.BoundedSemaphore(pool_size)
+
+    def getconn(self):
+        """
+        Returns a healthy connection from the pool (raises one of
+        RETRY_ERRORS if none can be opened)
+        """
+        self.slots.acquire()
+        try:
+            conn = self.pool.getconn()
+            if (time.monotonic() - conn.last_used > self.health_check_interval):
+                try:
+                    cur = conn.cursor()
+                    cur.execute('SELECT 1')
+                    cur.close()
+                except RETRY_ERRORS:
+                    self.logger.warning('database connection lost - reconnecting')
+                    self.pool.putconn(conn, close=True)
+                    conn = self.pool.getconn()
+        except:
+            self.slots.release()
+            raise
+
+        return conn
+
+    def putconn(self, conn):
+        """
+        Returns a connection to the pool (a connection that was lost is
+        dropped from it)
+        """
+        try:
+            conn.last_used = time.monotonic()
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.slots.release()
+
+    def retry(self, function, retries):
+        """
+        Calls function until it doesn't raise one of RETRY_ERRORS, waiting
+        0.5, 1, 2, ... seconds (up to max_backoff) between attempts.  Gives
+        up after retries attempts (None to keep trying), raising the last
+        error; any other error is raised at once.
+        """
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            try:
+                return function()
+            except RETRY_ERRORS as e:
+                if (retries is not None and attempt >= retries):
+                    raise
+                delay = min(0.5 * 2 ** (attempt - 1), self.max_backoff)
+                log_msg = 'database error {} (attempt {}) - retrying in {} seconds'
+                log_msg = log_msg.format(' '.join(str(e).split()), attempt, delay)
+                self.logger.warning(log_msg)
+                time.sleep(delay)
+
+    def execute(self, query, params=None, fetch=None, name=None, retries=5):
+        """
+        Runs one statement on a pooled connection, retrying it (see retry)
+        when the connection is lost or the statement times out.
+        query: the statement; with name, it's prepared on the server as
+               name (once per connection), with $1, $2, ... for the params,
+               otherwise psycopg2 %s placeholders are used
+        params: sequence of parameters
+        fetch: None, 'one' (returns the first row) or 'all' (returns the
+               rows)
+        retries: attempts (None to keep trying)
+        """
+        def run():
+            conn = self.getconn()
+            try:
+                cur = conn.cursor()
+                try:
+                    if name is None:
+                        cur.execute(query, params)
+                    else:
+                        execute_prepared(cur, name, query, params)
+                    result = None
+                    if fetch == 'one':
+                        result = cur.fetchone()
+                    elif fetch == 'all':
+                        result = cur.fetchall()
+                finally:
+                    cur.close()
+            finally:
+                self.putconn(conn)
+            return result
+
+        return self.retry(run, retries)
+
+    @contextlib.contextmanager
+    def connection(self, retries=5):
+        """
+        Lends a healthy connection for a block of work ('with
+        db.connection() as conn:'), waiting for the database (see retry)
+        if it can't be reached
+        """
+        conn = self.retry(self.getconn, retries)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def check(self):
+        """
+        Raises psycopg2.Error if the database can't be reached
+        """
+        self.execute('SELECT 1', fetch='one', retries=1)
+
+    def close(self):
+        self.pool.closeall()
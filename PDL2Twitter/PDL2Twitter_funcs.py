@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
 import os.path
+import queue
+import atexit
 import configparser
 import logging.handlers
 import urllib.request
@@ -66,7 +68,15 @@ def create_logger(d):
                    backupCount = bkup_count)
     file_handler.suffix = bkup_suffix
     file_handler.setFormatter(main_formatter)
-    logger.addHandler(file_handler)
+
+    # records are written by a listener thread; PDL2Twitter flushes it
+    # with stop_logger() before it exits
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = logging.handlers.QueueListener(log_queue, file_handler)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    atexit.register(stop_logger, logger)
 
     # Set highest message level that will be logged
     level = config.get('SETUP', 'logging_level')
@@ -80,6 +90,16 @@ def create_logger(d):
 
     return logger
 
+def stop_logger(logger):
+    """
+    Flushes the queued records to the logfile and stops the listener
+    thread.  Does nothing if it's already stopped.
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+            handler.listener.stop()
+
 def get_region_name(lat, lon, url, logger):
     """
     Return the short version of the FE region name.
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+import os
+import re
+import gzip
+import json
+import time
+import datetime
+import threading
+from collections import deque
+
+# zstd is used when the zstandard package is installed, gzip otherwise
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Twitter2Pg_archive_funcs.py - Optional archive of the raw stream.  Every
+                              payload the stream delivers is written, as
+                              received, to hourly compressed JSONL files
+                              (the format --from-file replays), with a small
+                              JSON index per file of the first/last twitter_id
+                              and time it holds.
+"""
+
+# the ids and times are read from the raw payload - no JSON decode
+ID_REGEX = re.compile(r'"id_str"\s*:\s*"(\d+)"')
+TIMESTAMP_REGEX = re.compile(r'"timestamp_ms"\s*:\s*"(\d+)"')
+
+
+def get_archive_compression(compression):
+    """
+    Resolves the configured compression ('auto', 'zstd' or 'gzip') to the
+    one that will be used.  Returns None if zstd was asked for but the
+    zstandard package isn't installed.
+    """
+    if compression == 'auto':
+        if zstandard is not None:
+            return 'zstd'
+        return 'gzip'
+    if (compression == 'zstd' and zstandard is None):
+        return None
+    return compression
+
+
+class ArchiveWriter(object):
+    """
+    Buffers raw payloads in memory and writes them from a background thread.
+    The buffer is bounded - when it's full, payloads are dropped (and
+    counted) rather than blocking the stream thread.  Files are named by the
+    UTC hour the payloads arrived in, tweets_YYYYMMDD_HH.jsonl.zst (or .gz),
+    with a part number added if the hour's file already exists (e.g. after a
+    restart), so every file is a single compressed stream.  Each file has an
+    index, the same name with .idx.json, rewritten every index_interval
+    seconds and when the file is closed.
+    directory: archive directory (created if needed)
+    logger: logger object
+    compression: 'zstd' or 'gzip'
+    buffer_size: int, most payloads held in memory
+    index_interval: float, seconds between index rewrites
+    """
+
+    def __init__(self, directory, logger, compression, buffer_size,
+                 index_interval):
+        self.directory = directory
+        self.logger = logger
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.index_interval = index_interval
+        self.buffer = deque()
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.num_dropped = 0
+        self.file = None
+        self.hour = None
+        self.index = None
+        self.index_filespec = None
+        self.last_index_write = 0.0
+        self.thread = threading.Thread(target=self.run, name='ArchiveWriter')
+        self.thread.daemon = True
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def start(self):
+        self.thread.start()
+
+    def add(self, data):
+        """
+        Queues one raw payload (called by the stream thread - never blocks)
+        """
+        with self.cond:
+            if len(self.buffer) >= self.buffer_size:
+                self.num_dropped = self.num_dropped + 1
+                return
+            self.buffer.append((time.time(), data))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.buffer and not self.stopping:
+                    self.cond.wait(self.index_interval)
+                    if not self.buffer:
+                        break
+                items = self.buffer
+                self.buffer = deque()
+                num_dropped = self.num_dropped
+                self.num_dropped = 0
+                stopping = self.stopping
+            if num_dropped:
+                log_msg = 'archive buffer full - {} payloads not archived'
+                log_msg = log_msg.format(num_dropped)
+                self.logger.warning(log_msg)
+            for arrival_time, data in items:
+                self.write(arrival_time, data)
+            if (self.file is not None
+                and time.time() - self.last_index_write >= self.index_interval):
+                self.file.flush()
+                self.write_index()
+            if (stopping and not items):
+                break
+        self.close_file()
+
+    def write(self, arrival_time, data):
+        hour = datetime.datetime.utcfromtimestamp(arrival_time).strftime('%Y%m%d_%H')
+        if hour != self.hour:
+            self.close_file()
+            self.open_file(hour)
+
+        line = data.strip()
+        if not line:
+            return
+        self.file.write((line + '\n').encode('utf-8'))
+
+        # keep the index up to date - tweets without an id (e.g. delete
+        # notices) are archived but not indexed
+        m = ID_REGEX.search(line)
+        if m is None:
+            return
+        twitter_id = int(m.group(1))
+        m = TIMESTAMP_REGEX.search(line)
+        if m is not None:
+            tweet_time = int(m.group(1)) / 1000.0
+        else:
+            tweet_time = arrival_time
+        index = self.index
+        if index['first_twitter_id'] is None:
+            index['first_twitter_id'] = twitter_id
+            index['first_time'] = tweet_time
+            index['min_twitter_id'] = twitter_id
+            index['max_twitter_id'] = twitter_id
+        index['last_twitter_id'] = twitter_id
+        index['last_time'] = tweet_time
+        index['min_twitter_id'] = min(index['min_twitter_id'], twitter_id)
+        index['max_twitter_id'] = max(index['max_twitter_id'], twitter_id)
+        index['min_time'] = min(index.get('min_time', tweet_time), tweet_time)
+        index['max_time'] = max(index.get('max_time', tweet_time), tweet_time)
+        index['count'] = index['count'] + 1
+
+    def open_file(self, hour):
+        extension = '.jsonl.zst' if self.compression == 'zstd' else '.jsonl.gz'
+        name = 'tweets_' + hour
+        part = 0
+        while (os.path.exists(os.path.join(self.directory, name + extension))
+               or os.path.exists(os.path.join(self.directory, name + '.idx.json'))):
+            part = part + 1
+            name = 'tweets_{}_{}'.format(hour, part)
+        filespec = os.path.join(self.directory, name + extension)
+
+        if self.compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=3)
+            self.file = compressor.stream_writer(open(filespec, 'wb'))
+        else:
+            self.file = gzip.open(filespec, 'wb', compresslevel=6)
+        self.hour = hour
+        self.index_filespec = os.path.join(self.directory, name + '.idx.json')
+        self.index = {'file': name + extension,
+                      'first_twitter_id': None, 'last_twitter_id': None,
+                      'min_twitter_id': None, 'max_twitter_id': None,
+                      'first_time': None, 'last_time': None,
+                      'count': 0}
+
+        log_msg = 'archiving the stream to {}'
+        log_msg = log_msg.format(filespec)
+        self.logger.info(log_msg)
+
+    def write_index(self):
+        temp_filespec = self.index_filespec + '.tmp'
+        with open(temp_filespec, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(temp_filespec, self.index_filespec)
+        self.last_index_write = time.time()
+
+    def close_file(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        self.hour = None
+        self.write_index()
+
+    def stop(self):
+        """
+        Writes what's buffered, closes the current file and stops the thread
+        """
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread.is_alive():
+            self.thread.join()
+
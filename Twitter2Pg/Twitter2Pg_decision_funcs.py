@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import threading
+
+"""
+Twitter2Pg_decision_funcs.py - Counts the accept/reject decisions made for
+                               each tweet.  Under a flood, a log line per
+                               tweet costs as much as the work itself, so
+                               the decisions are logged as periodic counts
+                               (by reason), with only a sample of them logged
+                               one by one.
+"""
+
+
+class DecisionCounter(object):
+    """
+    Counts decisions by reason ('ACCEPT', 'reject - no filter terms in
+    tweet', ...).  Every sample_every'th decision of each reason is also
+    logged on its own (0 logs none, 1 logs them all, as Twitter2Pg used to).
+    logger: logger object (the sampled decisions are logged at INFO)
+    sample_every: int
+    """
+
+    def __init__(self, logger, sample_every):
+        self.logger = logger
+        self.sample_every = sample_every
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, reason, log_msg=None):
+        """
+        Counts one decision.
+        reason: the reason counted (no tweet specifics, e.g. no id)
+        log_msg: the message logged if the decision is sampled (default
+                 the reason)
+        """
+        with self.lock:
+            num = self.counts.get(reason, 0) + 1
+            self.counts[reason] = num
+        if (self.sample_every > 0 and num % self.sample_every == 0):
+            if log_msg is None:
+                log_msg = reason
+            self.logger.info(log_msg)
+
+    def add_counts(self, counts):
+        """
+        Adds counts taken from another counter (e.g. one in a parse process)
+        """
+        with self.lock:
+            for reason in counts:
+                self.counts[reason] = self.counts.get(reason, 0) + counts[reason]
+
+    def take_counts(self):
+        """
+        Returns the counts since the last call, and resets them
+        """
+        with self.lock:
+            counts = self.counts
+            self.counts = {}
+
+        return counts
+
+
+def log_decision_counts(decision_counter, logger, interval, stop_event):
+    """
+    Logs the decision counts every interval seconds until stop_event is set,
+    and once more when it is (runs in its own thread)
+    """
+    stopping = False
+    while not stopping:
+        stopping = stop_event.wait(interval)
+        counts = decision_counter.take_counts()
+        if not counts:
+            continue
+        num_accepted = counts.pop('ACCEPT', 0)
+        num_rejected = sum(counts.values())
+        log_msg = 'tweets in the last {} s: {} accepted  {} rejected'
+        log_msg = log_msg.format(interval, num_accepted, num_rejected)
+        logger.info(log_msg)
+        for reason in sorted(counts, key=counts.get, reverse=True):
+            log_msg = '    {:8d}  {}'
+            log_msg = log_msg.format(counts[reason], reason)
+            logger.info(log_msg)
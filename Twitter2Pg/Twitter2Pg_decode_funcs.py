@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import json
+
+# faster JSON parsers, used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+"""
+Twitter2Pg_decode_funcs.py - The JSON decoder used for tweets.  orjson or
+                             ujson is used when installed (auto), otherwise
+                             the standard library json module.
+"""
+
+DECODERS = ['auto', 'orjson', 'ujson', 'json']
+
+
+def get_available_decoders():
+    """
+    Returns the list of the decoders that can be used, fastest first
+    """
+    available = []
+    if orjson is not None:
+        available.append('orjson')
+    if ujson is not None:
+        available.append('ujson')
+    available.append('json')
+
+    return available
+
+
+def get_decoder(name):
+    """
+    Returns the name and the loads function of a decoder, or None, None if
+    the decoder isn't installed.  All of them raise ValueError on bad JSON.
+    name: one of DECODERS ('auto' picks the fastest available)
+    """
+    if name == 'auto':
+        name = get_available_decoders()[0]
+    if (name == 'orjson' and orjson is not None):
+        return name, orjson.loads
+    if (name == 'ujson' and ujson is not None):
+        return name, ujson.loads
+    if name == 'json':
+        return name, json.loads
+
+    return None, None
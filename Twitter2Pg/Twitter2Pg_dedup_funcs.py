@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import re
+import time
+import threading
+
+"""
+Twitter2Pg_dedup_funcs.py - Drops tweets that were already received.  Stream
+                            reconnects (and overlapping filters) redeliver
+                            tweets, and a duplicate would otherwise be
+                            decoded, filtered and sent to the database only
+                            to be ignored by ON CONFLICT DO NOTHING.
+"""
+
+# the first id_str of a payload - the tweet's own when it comes before any
+# nested object (the stream sends created_at, id, id_str first)
+ID_REGEX = re.compile(r'"id_str"\s*:\s*"(\d+)"')
+
+
+def get_raw_twitter_id(data):
+    """
+    Returns the twitter_id (int) of a raw tweet without decoding it, or None
+    if it can't be read safely (no id_str, or the first one is inside a
+    nested object, e.g. the user's)
+    data: raw tweet data (JSON string)
+    """
+    m = ID_REGEX.search(data)
+    if m is None:
+        return None
+    if data.find('{', data.find('{') + 1, m.start()) != -1:
+        return None
+    return int(m.group(1))
+
+
+class RecentIds(object):
+    """
+    The twitter_ids received in the last window to 2 * window seconds, as
+    two generations of sets: ids are added to the current set, looked up in
+    both, and every window seconds (or sooner, when the current set holds
+    max_ids) the previous set is discarded and the current one takes its
+    place.  Memory is bounded by 2 * max_ids ids, and there are no false
+    positives - a duplicate is only missed once it's older than the window
+    (the database still ignores it).
+    window: float, seconds
+    max_ids: int, most ids in a generation
+    """
+
+    def __init__(self, window, max_ids):
+        self.window = window
+        self.max_ids = max_ids
+        self.lock = threading.Lock()
+        self.current = set()
+        self.previous = set()
+        self.rotated = time.monotonic()
+
+    def seen(self, twitter_id):
+        """
+        Returns True if the id was received recently (a duplicate),
+        otherwise remembers it and returns False
+        """
+        with self.lock:
+            if (twitter_id in self.current or twitter_id in self.previous):
+                return True
+            if (len(self.current) >= self.max_ids
+                or time.monotonic() - self.rotated >= self.window):
+                self.previous = self.current
+                self.current = set()
+                self.rotated = time.monotonic()
+            self.current.add(twitter_id)
+            return False
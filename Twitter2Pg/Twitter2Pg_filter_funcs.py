@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+import re
+import json
+import threading
+import psycopg2
+
+"""
+Twitter2Pg_filter_funcs.py - Decides which tweets from the stream are stored.
+                             The keywords (keyword table) and the exclusion
+                             settings ([TWITTER] section of Twitter2Pg.ini)
+                             are compiled once into regular expressions, and
+                             recompiled when the keyword table changes.
+"""
+
+# the "text" strings of a raw tweet (the tweet's own, and those of nested
+# objects, e.g. a retweeted tweet or hashtags) - escaped quotes don't end
+# a string, and a "text" inside a string has its quotes escaped
+TEXT_REGEX = re.compile(r'"text"\s*:\s*"([^"\\]*(?:\\.[^"\\]*)*)"')
+UNICODE_ESCAPE_REGEX = re.compile(r'\\u[0-9a-f]{4}')
+
+# keywords Twitter is sure to match as words (ASCII words and spaces)
+WORD_KEYWORD_REGEX = re.compile(r'^[A-Za-z0-9_]+( [A-Za-z0-9_]+)*$')
+
+
+def load_keywords(db, retries=5):
+    """
+    Reads the keyword table.  Returns the list of keywords (titles).
+    db: Database object
+    retries: attempts (None to keep trying)
+    """
+    rows = db.execute("select title from keyword order by title",
+                      fetch='all', retries=retries)
+
+    return [row[0] for row in rows]
+
+
+def get_keyword_fingerprint(db, retries=5):
+    """
+    Returns an md5 of the keyword table, used to notice changes without
+    reading the whole table.
+    db: Database object
+    retries: attempts (None to keep trying)
+    """
+    row = db.execute("select md5(coalesce(string_agg(title, ',' order by title), ''))"
+                     " from keyword", fetch='one', retries=retries)
+
+    return row[0]
+
+
+def get_raw_text(data):
+    """
+    Returns the text of a raw tweet without decoding the tweet: its first
+    "text" string, unescaped.  Returns None if there is no "text", and
+    raises ValueError if the first one can't be told to be the tweet's own
+    (it's inside a nested object, e.g. a retweeted tweet's).
+    data: raw tweet data (JSON string)
+    """
+    m = TEXT_REGEX.search(data)
+    if m is None:
+        return None
+    if data.find('{', data.find('{') + 1, m.start()) != -1:
+        raise ValueError('the first text is in a nested object')
+    text = m.group(1)
+    if '\\' in text:
+        text = json.loads('"' + text + '"')
+
+    return text
+
+
+def get_trie_pattern(node):
+    # one node of the trie: a dict of next character -> node, with an
+    # '' key when a term ends here
+    branches = []
+    for ch in sorted(key for key in node if key != ''):
+        branches.append(re.escape(ch) + get_trie_pattern(node[ch]))
+    if not branches:
+        return ''
+    if (len(branches) == 1 and '' not in node):
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        pattern = pattern + '?'
+    return pattern
+
+
+def get_alternation(terms):
+    """
+    Compiles a list of terms into one regular expression that finds any of
+    them.  The terms are arranged as a trie (common prefixes are shared),
+    so at each position of the text the regex engine follows one path
+    instead of trying every term in turn - a plain a|b|c alternation of a
+    few hundred keywords is no faster than testing them one by one.
+    terms: list of strings
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    return re.compile(get_trie_pattern(trie))
+
+
+def get_word_alternation(terms):
+    """
+    Like get_alternation, but only finds the terms as whole words
+    terms: list of strings
+    """
+    pattern = get_alternation(terms).pattern
+
+    return re.compile(r'(?<!\w)(?:' + pattern + r')(?!\w)')
+
+
+def get_raw_forms(keyword):
+    """
+    Returns the set of ways the keyword can appear in the raw JSON of a
+    tweet: as is, and with the characters JSON escapes escaped (the stream
+    escapes all non-ASCII characters, and forward slashes) in lower and
+    upper case hex.
+    """
+    escaped = json.dumps(keyword)[1:-1]
+    forms = set([keyword, json.dumps(keyword, ensure_ascii=False)[1:-1],
+                 escaped])
+    forms.add(UNICODE_ESCAPE_REGEX.sub(lambda m: '\\u' + m.group(0)[2:].upper(),
+                                       escaped))
+    for form in list(forms):
+        forms.add(form.replace('/', '\\/'))
+
+    return forms
+
+
+class TweetFilter(object):
+    """
+    The compiled filter.  A tweet is kept if its text contains at least one
+    keyword (case sensitive, as Twitter matched it), doesn't start with RT
+    when filter_RT_out is set, and doesn't contain any of the
+    filter_terms_out (case insensitive - the text is lowercased once).
+    precheck() can reject most tweets without a keyword from the raw JSON,
+    before it is decoded.
+    With keyword sharding, a tweet that has one of the yield_keywords (the
+    keywords of the shards before this one) as a whole word is rejected:
+    that shard receives and keeps it too.  Only keywords the stream is sure
+    to match that way are used (ASCII words) - a tweet with any other is
+    kept by every shard it reaches, and the database drops the copies.
+    keywords: list of keywords
+    filter_RT_out: bool
+    filter_terms_out: comma-separated string of terms, or None
+    yield_keywords: list of keywords, or None
+    """
+
+    def __init__(self, keywords, filter_RT_out, filter_terms_out,
+                 yield_keywords=None):
+        self.keywords = keywords
+        self.filter_RT_out = filter_RT_out
+        self.keyword_regex = None
+        if keywords:
+            self.keyword_regex = get_alternation(keywords)
+        # the keywords as they can appear in the raw JSON, for precheck()
+        self.raw_regex = None
+        if keywords:
+            raw_forms = set()
+            for keyword in keywords:
+                raw_forms.update(get_raw_forms(keyword))
+            self.raw_regex = get_alternation(sorted(raw_forms))
+        self.yield_regex = None
+        if yield_keywords:
+            word_keywords = [keyword for keyword in yield_keywords
+                             if WORD_KEYWORD_REGEX.match(keyword) is not None]
+            if word_keywords:
+                self.yield_regex = get_word_alternation(word_keywords)
+        self.exclusion_regex = None
+        if filter_terms_out is not None:
+            terms = [term.lower() for term in filter_terms_out.split(",")]
+            self.exclusion_regex = get_alternation(terms)
+
+    def precheck(self, data):
+        """
+        Returns False if the raw tweet data (JSON string) certainly has no
+        keyword in its text, True if it may have one.  Only the "text"
+        strings are searched, still escaped, and all of them (a nested
+        "text" can't be told from the tweet's own without decoding), so a
+        keyword in any of them passes.  Tweets without a "text" are passed
+        (they are rejected after decoding, with the reason), and so are
+        texts with a $ (it is removed from the text before the keywords
+        are matched, which can join a keyword).
+        """
+        if self.raw_regex is None:
+            return False
+        found_text = False
+        for m in TEXT_REGEX.finditer(data):
+            found_text = True
+            raw_text = m.group(1)
+            if self.raw_regex.search(raw_text) is not None:
+                return True
+            if '$' in raw_text:
+                return True
+        return not found_text
+
+    def check(self, text):
+        """
+        Returns None if the tweet should be stored, otherwise the reason
+        it was rejected (for the log).
+        text: tweet text (wrapped in double dollar signs)
+        """
+        if (self.keyword_regex is None
+            or self.keyword_regex.search(text) is None):
+            return "reject - no filter terms in tweet"
+
+        # Note: string starts with double dollar signs
+        if (self.filter_RT_out is True and text[2:4] == 'RT'):
+            return "reject - tweet starts with RT"
+
+        if self.exclusion_regex is not None:
+            m = self.exclusion_regex.search(text.lower())
+            if m is not None:
+                log_msg = ("reject - tweet contains '{}'")
+                return log_msg.format(m.group(0))
+
+        if (self.yield_regex is not None
+            and self.yield_regex.search(text) is not None):
+            return "reject - kept by a lower shard"
+
+        return None
+
+
+class KeywordWatcher(object):
+    """
+    Checks the keyword table every interval seconds from a background
+    thread, and calls on_change with the new list of keywords when it has
+    changed.  Each check tries the database once - a lost connection is
+    replaced by the pool, and the next check tries again.
+    db: Database object
+    logger: logger object
+    interval: float, seconds between checks
+    on_change: function taking the list of keywords
+    """
+
+    def __init__(self, db, logger, interval, on_change):
+        self.db = db
+        self.logger = logger
+        self.interval = interval
+        self.on_change = on_change
+        self.fingerprint = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='KeywordWatcher')
+        self.thread.daemon = True
+
+    def start(self):
+        try:
+            self.fingerprint = get_keyword_fingerprint(self.db, retries=1)
+        except (Exception, psycopg2.DatabaseError) as e:
+            log_msg = "error '{}' checking the keyword table"
+            log_msg = log_msg.format(e)
+            self.logger.error(log_msg)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                fingerprint = get_keyword_fingerprint(self.db, retries=1)
+                if fingerprint == self.fingerprint:
+                    continue
+                keywords = load_keywords(self.db, retries=1)
+            except (Exception, psycopg2.DatabaseError) as e:
+                log_msg = "error '{}' checking the keyword table"
+                log_msg = log_msg.format(e)
+                self.logger.error(log_msg)
+                continue
+            self.fingerprint = fingerprint
+            self.on_change(keywords)
+
+    def stop(self):
+        self.stop_event.set()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
 import os.path
+import queue
+import atexit
 import configparser
 import logging.handlers
 import urllib.request
@@ -65,7 +67,16 @@ def create_logger(d):
                    backupCount = d['bkup_count'])
     file_handler.suffix = d['bkup_suffix']
     file_handler.setFormatter(main_formatter)
-    logger.addHandler(file_handler)
+
+    # the stream and worker threads only queue the records - a listener
+    # thread writes the file.  Twitter2Pg calls stop_logger() on its way
+    # out (atexit covers the sys.exit calls)
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = logging.handlers.QueueListener(log_queue, file_handler)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    atexit.register(stop_logger, logger)
 
     # Set highest message level that will be logged
     level = d['logging_level']
@@ -81,3 +92,37 @@ def create_logger(d):
 
     return logger
 
+
+def stop_logger(logger):
+    """
+    Writes out the queued records and stops the listener thread started
+    by create_logger.  Safe to call more than once
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+            handler.listener.stop()
+
+
+
+def get_candidate_info(text, candidate_regex, max_words):
+    """
+    Classifies the text of a tweet the same way tedect does when counting
+    tweets in a bin.  The word count is the number of space separated items
+    in the text, and the tweet is a candidate (it counts toward detection)
+    when it has fewer than max_words words and none of the filter terms
+    are present.  tedect's alert used to take a tweet with exactly
+    max_words words as a triggering tweet (<= max_words) even though the
+    bin count never counted it; the flag follows the bin count.
+    Returns a (word_count, is_candidate) tuple.
+    text: String, tweet text with dollar signs removed (not $$ wrapped)
+    candidate_regex: compiled regular expression built from the
+                     filter_terms in the [CANDIDATE] section of the
+                     config file
+    max_words: Integer, max_words from the [CANDIDATE] section
+    """
+    word_count = len(text.split(' '))
+    is_candidate = (word_count < max_words
+                    and candidate_regex.search(text) is None)
+
+    return word_count, is_candidate
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+import multiprocessing
+
+"""
+Twitter2Pg_pool_funcs.py - Pool of parse processes for Twitter2Pg.  During a
+                           flood, decoding and filtering the tweets on one
+                           Python process is the ceiling; the pool spreads
+                           that work over processes = N cores.  The workers
+                           only parse and filter (no database, no files) and
+                           return the message dictionaries of the tweets
+                           that passed, which the parent translates and hands
+                           to the batched writer.
+"""
+
+
+class RecordingLogger(object):
+    """
+    Stands in for the logger in the parse processes, which must not write
+    to the log file themselves (several processes would be rotating the
+    same file).  The records are returned to the parent and logged there.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def log(self, level, msg, *args, **kwargs):
+        self.records.append((level, msg))
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg)
+
+    def take_records(self):
+        records = self.records
+        self.records = []
+        return records
+
+
+class ParsePool(object):
+    """
+    A multiprocessing pool of parse processes.  The processes are spawned,
+    not forked - the parent is running threads by the time the pool is
+    created, and a forked child could inherit a lock (e.g. a logging
+    handler's) held by one of them.  Each new process gets the filter and
+    settings through initargs; restart() replaces the processes with ones
+    given new initargs (e.g. after the keyword table changes).  Calls in
+    flight on the old pool finish there.
+    processes: int, number of processes
+    initializer: function run in each new process, given initargs
+    initargs: tuple of the (picklable) arguments of the initializer
+    classify: function run in the processes on a list of raw payloads
+    """
+
+    def __init__(self, processes, initializer, initargs, classify):
+        self.processes = processes
+        self.initializer = initializer
+        self.classify_func = classify
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        self.pool = self.new_pool(initargs)
+
+    def new_pool(self, initargs):
+        return self.context.Pool(self.processes, initializer=self.initializer,
+                                 initargs=initargs)
+
+    def classify(self, payloads):
+        """
+        Runs the classify function on a batch of payloads in one of the
+        processes and returns its result (blocks the calling thread)
+        """
+        while True:
+            with self.lock:
+                pool = self.pool
+            try:
+                return pool.apply(self.classify_func, (payloads,))
+            except ValueError:
+                # the pool was replaced (and closed) by restart() - use
+                # the new one
+                if pool is self.pool:
+                    raise
+
+    def restart(self, initargs):
+        new_pool = self.new_pool(initargs)
+        with self.lock:
+            old_pool = self.pool
+            self.pool = new_pool
+        old_pool.close()
+
+    def stop(self):
+        with self.lock:
+            self.pool.close()
+            self.pool.join()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+import gc
+import os
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import resource
+import threading
+import traceback
+from collections import deque
+
+"""
+Twitter2Pg_profile_funcs.py - Profiling on demand.  Twitter2Pg runs for weeks,
+                              and restarting it when it slows down loses the
+                              evidence, so it can be examined while it runs:
+                              'kill -USR1 pid' profiles it for a while and
+                              'kill -USR2 pid' dumps its state, both into the
+                              log directory.  Nothing is measured until a
+                              signal arrives.
+"""
+
+PROFILERS = ['sampling', 'cprofile']
+
+
+def get_memory():
+    """
+    Returns the memory used by the process, in MB, as a dict: 'rss' (now,
+    Linux only) and 'peak'
+    """
+    memory = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss'] = round(int(line.split()[1]) / 1024.0, 1)
+                elif line.startswith('VmHWM:'):
+                    memory['peak'] = round(int(line.split()[1]) / 1024.0, 1)
+    except (IOError, OSError, ValueError):
+        pass
+    if 'peak' not in memory:
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            peak = peak / 1024.0
+        memory['peak'] = round(peak / 1024.0, 1)
+
+    return memory
+
+
+def get_stack(frame):
+    """
+    Returns the stack of a frame as a list of 'file:function', outermost
+    first
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(os.path.basename(code.co_filename) + ':' + code.co_name)
+        frame = frame.f_back
+    stack.reverse()
+
+    return stack
+
+
+class Profiler(object):
+    """
+    SIGUSR1 starts a profile of duration seconds (a second SIGUSR1 stops it
+    early).  The sampling profiler records the stack of every thread each
+    interval seconds and writes them to a .folded file (one 'thread;outer;
+    ...;inner count' line per stack, the input of flamegraph.pl and
+    speedscope) and a summary of the busiest functions to a .txt file.
+    The cprofile profiler traces the main thread only (cProfile can't
+    follow the others) and writes a .prof file (pstats, snakeviz) and the
+    pstats summary to a .txt file.
+    SIGUSR2 logs the sizes returned by get_sizes and the memory used, and
+    writes them with the stack of every thread to a _state .txt file.
+    A signal handler interrupts the main thread wherever it is - logging
+    from it could deadlock on a lock the main thread holds - so the
+    handler only queues the request for the profiler's own thread, which
+    sleeps until there is one.
+    logger: logger object
+    directory: where the files are written (the log directory)
+    program_name: start of the file names
+    get_sizes: function returning a dict of the sizes (queue depths, ...)
+    profiler: one of PROFILERS
+    duration: float, seconds profiled
+    interval: float, seconds between samples (sampling profiler)
+    """
+
+    def __init__(self, logger, directory, program_name, get_sizes, profiler,
+                 duration, interval):
+        self.logger = logger
+        self.directory = directory
+        self.program_name = program_name
+        self.get_sizes = get_sizes
+        self.profiler = profiler
+        self.duration = duration
+        self.interval = interval
+        self.requests = deque()
+        self.wake = threading.Event()
+        self.end = None
+        # sampling profiler
+        self.samples = None
+        self.num_samples = 0
+        self.started = None
+        # cprofile profiler (only touched by the main thread)
+        self.profile = None
+        self.serial = 0
+        self.expire_serial = None
+        self.thread = threading.Thread(target=self.run, name='Profiler')
+        self.thread.daemon = True
+
+    def install(self):
+        """
+        Starts the profiler thread and sets the SIGUSR1 and SIGUSR2
+        handlers (must be called from the main thread)
+        """
+        self.thread.start()
+        signal.signal(signal.SIGUSR1, self.on_signal)
+        signal.signal(signal.SIGUSR2, self.on_signal)
+
+    def on_signal(self, signum, frame):
+        if signum == signal.SIGUSR2:
+            self.requests.append(('dump', None))
+        elif self.profiler == 'sampling':
+            self.requests.append(('sample', None))
+        elif self.expire_serial is not None:
+            # the profiler thread's signal to end the profile it started
+            # (a profile started since then is left running)
+            serial = self.expire_serial
+            self.expire_serial = None
+            if (self.profile is not None and self.serial == serial):
+                self.stop_cprofile()
+        elif self.profile is None:
+            # cProfile is switched on and off in the thread it profiles
+            self.profile = cProfile.Profile()
+            self.serial = self.serial + 1
+            self.profile.enable()
+            self.requests.append(('cprofile', self.serial))
+        else:
+            self.stop_cprofile()
+        self.wake.set()
+
+    def stop_cprofile(self):
+        self.profile.disable()
+        self.requests.append(('cprofile_done', self.profile))
+        self.profile = None
+
+    def run(self):
+        expire = None
+        while True:
+            timeout = None
+            if self.samples is not None:
+                timeout = self.interval
+            elif expire is not None:
+                timeout = max(self.end - time.time(), 0)
+            self.wake.wait(timeout)
+            self.wake.clear()
+            try:
+                while self.requests:
+                    request, value = self.requests.popleft()
+                    if request == 'dump':
+                        self.dump_state()
+                    elif request == 'sample':
+                        if self.samples is None:
+                            self.start_sampling()
+                        else:
+                            self.write_samples()
+                    elif request == 'cprofile':
+                        expire = value
+                        self.end = time.time() + self.duration
+                        log_msg = 'cProfile of the main thread started for {} seconds'
+                        log_msg = log_msg.format(self.duration)
+                        self.logger.info(log_msg)
+                    elif request == 'cprofile_done':
+                        expire = None
+                        self.write_cprofile(value)
+                if self.samples is not None:
+                    self.take_sample()
+                    if time.time() >= self.end:
+                        self.write_samples()
+                elif (expire is not None and time.time() >= self.end):
+                    # ask the main thread to stop the cProfile
+                    self.expire_serial = expire
+                    expire = None
+                    os.kill(os.getpid(), signal.SIGUSR1)
+            except (IOError, OSError) as e:
+                log_msg = 'Error {} writing a profile'
+                log_msg = log_msg.format(e)
+                self.logger.error(log_msg)
+                self.samples = None
+
+    def get_filespec(self, kind, extension):
+        name = '{}_{}_{}.{}'
+        name = name.format(self.program_name, kind,
+                           time.strftime('%Y%m%d_%H%M%S'), extension)
+        return os.path.join(self.directory, name)
+
+    def start_sampling(self):
+        self.samples = {}
+        self.num_samples = 0
+        self.started = time.time()
+        self.end = self.started + self.duration
+        log_msg = 'sampling profiler started for {} seconds'
+        log_msg = log_msg.format(self.duration)
+        self.logger.info(log_msg)
+
+    def take_sample(self):
+        names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = [names.get(ident, str(ident))] + get_stack(frame)
+            stack = ';'.join(stack)
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+        self.num_samples = self.num_samples + 1
+
+    def write_samples(self):
+        """
+        Writes the sampled stacks (.folded) and the functions seen most
+        often, at the top of a stack (self) or anywhere in it (total)
+        """
+        samples = self.samples
+        self.samples = None
+        elapsed = time.time() - self.started
+        folded_filespec = self.get_filespec('profile', 'folded')
+        with open(folded_filespec, 'w', encoding='utf-8') as f:
+            for stack in sorted(samples):
+                f.write('{} {}\n'.format(stack, samples[stack]))
+
+        own_counts = {}
+        total_counts = {}
+        thread_counts = {}
+        for stack, count in samples.items():
+            frames = stack.split(';')
+            thread_counts[frames[0]] = thread_counts.get(frames[0], 0) + count
+            if len(frames) > 1:
+                own_counts[frames[-1]] = own_counts.get(frames[-1], 0) + count
+            for function in set(frames[1:]):
+                total_counts[function] = total_counts.get(function, 0) + count
+        num_stacks = max(sum(thread_counts.values()), 1)
+        text_filespec = self.get_filespec('profile', 'txt')
+        with open(text_filespec, 'w', encoding='utf-8') as f:
+            f.write('{} samples of every thread in {:.1f} seconds\n\n'.format(
+                    self.num_samples, elapsed))
+            f.write('samples by thread\n')
+            for name in sorted(thread_counts, key=thread_counts.get, reverse=True):
+                f.write('  {:8d}  {}\n'.format(thread_counts[name], name))
+            for title, counts in [('self', own_counts), ('total', total_counts)]:
+                f.write('\nfunctions by {} samples (% of all thread samples)\n'.format(title))
+                for function in sorted(counts, key=counts.get, reverse=True)[:40]:
+                    f.write('  {:8d}  {:5.1f}%  {}\n'.format(counts[function],
+                            100.0 * counts[function] / num_stacks, function))
+
+        log_msg = 'sampling profiler wrote {} samples to {} and {}'
+        log_msg = log_msg.format(self.num_samples, folded_filespec, text_filespec)
+        self.logger.info(log_msg)
+
+    def write_cprofile(self, profile):
+        profile_filespec = self.get_filespec('profile', 'prof')
+        profile.dump_stats(profile_filespec)
+        text_filespec = self.get_filespec('profile', 'txt')
+        with open(text_filespec, 'w', encoding='utf-8') as f:
+            stats = pstats.Stats(profile, stream=f)
+            stats.sort_stats('cumulative').print_stats(40)
+            stats.sort_stats('tottime').print_stats(40)
+        log_msg = 'cProfile of the main thread written to {} and {}'
+        log_msg = log_msg.format(profile_filespec, text_filespec)
+        self.logger.info(log_msg)
+
+    def dump_state(self):
+        """
+        Logs the sizes and memory, and writes them with every thread's
+        stack to a file
+        """
+        try:
+            sizes = self.get_sizes()
+        except Exception as e:
+            sizes = {'error getting the sizes': str(e)}
+        memory = get_memory()
+        lines = []
+        lines.append('memory (MB): ' + '  '.join('{} {}'.format(key, memory[key])
+                                                 for key in sorted(memory)))
+        lines.append('threads: {}  gc counts: {}'.format(threading.active_count(),
+                                                          gc.get_count()))
+        for name in sizes:
+            lines.append('{}: {}'.format(name, sizes[name]))
+
+        filespec = self.get_filespec('state', 'txt')
+        names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+        with open(filespec, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + '\n')
+            for ident, frame in sys._current_frames().items():
+                f.write('\nthread {}\n'.format(names.get(ident, ident)))
+                f.write(''.join(traceback.format_stack(frame)))
+
+        for line in lines:
+            self.logger.info('state - ' + line)
+        log_msg = 'state - thread stacks written to {}'
+        log_msg = log_msg.format(filespec)
+        self.logger.info(log_msg)
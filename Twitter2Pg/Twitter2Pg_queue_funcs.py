@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+import os.path
+import threading
+from collections import deque
+
+"""
+Twitter2Pg_queue_funcs.py - The bounded queue between the Twitter stream
+                            and the worker threads that parse, filter and
+                            store the tweets.  The stream callback only
+                            queues the raw data, so a slow database can't
+                            back up the stream (Twitter disconnects slow
+                            consumers).
+"""
+
+OVERFLOW_POLICIES = ['block', 'drop_oldest', 'spill']
+
+# number of the oldest queued tweets searched for a non-candidate to drop
+DROP_SEARCH_DEPTH = 32
+
+
+class TweetQueue(object):
+    """
+    A bounded FIFO queue of raw tweet data (JSON strings) with queue depth
+    metrics.  What happens when the queue is full depends on the overflow
+    policy:
+      block - the stream thread waits for room
+      drop_oldest - the oldest non-candidate among the DROP_SEARCH_DEPTH
+                    oldest tweets is dropped (the oldest tweet if they are
+                    all candidates)
+      spill - the tweet is appended to a spill file, and the spilled tweets
+              are read back, in order, once the queue has emptied
+    max_size: int, most tweets held in memory
+    overflow_policy: one of OVERFLOW_POLICIES
+    is_expendable: function of the raw data, True if the tweet may be
+                   dropped (used by drop_oldest).  It's called once, when
+                   the tweet is queued, and the answer kept with the tweet,
+                   so a drop only reads the flags
+    spill_filespec: spill file (used by spill)
+    """
+
+    def __init__(self, max_size, overflow_policy, is_expendable=None,
+                 spill_filespec=None):
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.is_expendable = is_expendable
+        self.spill_filespec = spill_filespec
+        # (raw data, expendable) of the tweets in memory
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+
+        # metrics
+        self.high_water = 0
+        self.num_put = 0
+        self.num_dropped = 0
+        self.num_spilled = 0
+        self.num_blocked = 0
+
+        # spilled tweets not read back yet - left over from a previous run
+        # they are read back first
+        self.spill_pending = 0
+        self.spill_offset = 0
+        if (spill_filespec is not None and os.path.isfile(spill_filespec)):
+            with open(spill_filespec, 'r', encoding='utf-8') as f:
+                self.spill_pending = sum(1 for line in f)
+
+    def put(self, data):
+        """
+        Queues the raw data of one tweet (called by the stream thread)
+        """
+        # classified before taking the lock, so the workers aren't held up
+        expendable = False
+        if (self.overflow_policy == 'drop_oldest'
+            and self.is_expendable is not None):
+            expendable = self.is_expendable(data)
+        with self.cond:
+            self.num_put = self.num_put + 1
+            if (len(self.items) >= self.max_size or self.spill_pending):
+                if self.overflow_policy == 'block':
+                    self.num_blocked = self.num_blocked + 1
+                    while (len(self.items) >= self.max_size
+                           and not self.closed):
+                        self.cond.wait()
+                elif self.overflow_policy == 'drop_oldest':
+                    if len(self.items) >= self.max_size:
+                        self.drop_oldest()
+                else:
+                    # once tweets are spilled, later tweets are spilled too
+                    # until the spill is read back, to keep the order
+                    self.spill(data)
+                    return
+            self.items.append((data, expendable))
+            if len(self.items) > self.high_water:
+                self.high_water = len(self.items)
+            self.cond.notify()
+
+    def drop_oldest(self):
+        index = 0
+        for i in range(min(DROP_SEARCH_DEPTH, len(self.items))):
+            if self.items[i][1]:
+                index = i
+                break
+        del self.items[index]
+        self.num_dropped = self.num_dropped + 1
+
+    def spill(self, data):
+        with open(self.spill_filespec, 'a', encoding='utf-8') as f:
+            f.write(data.strip() + '\n')
+        self.spill_pending = self.spill_pending + 1
+        self.num_spilled = self.num_spilled + 1
+
+    def read_spill(self):
+        """
+        Moves up to max_size spilled tweets back into the queue.  The spill
+        file is removed once it has all been read.
+        """
+        with open(self.spill_filespec, 'r', encoding='utf-8') as f:
+            f.seek(self.spill_offset)
+            while (len(self.items) < self.max_size and self.spill_pending):
+                line = f.readline()
+                if not line:
+                    break
+                self.items.append((line, False))
+                self.spill_pending = self.spill_pending - 1
+            self.spill_offset = f.tell()
+        if self.spill_pending == 0:
+            os.remove(self.spill_filespec)
+            self.spill_offset = 0
+
+    def get(self):
+        """
+        Gets the oldest tweet (called by the worker threads).  Returns None
+        once the queue has been closed and emptied.
+        """
+        with self.cond:
+            while True:
+                if (not self.items and self.spill_pending):
+                    self.read_spill()
+                if self.items:
+                    data = self.items.popleft()[0]
+                    self.cond.notify_all()
+                    return data
+                if self.closed:
+                    return None
+                self.cond.wait()
+
+    def get_batch(self, max_items):
+        """
+        Gets up to max_items of the oldest tweets - waits for the first
+        one, but not for the rest.  Returns None once the queue has been
+        closed and emptied.
+        """
+        data = self.get()
+        if data is None:
+            return None
+        batch = [data]
+        with self.cond:
+            while (len(batch) < max_items and self.items):
+                batch.append(self.items.popleft()[0])
+            self.cond.notify_all()
+
+        return batch
+
+    def close(self):
+        """
+        Stops the queue - the workers finish what's queued and get None
+        (spilled tweets stay in the spill file for the next run)
+        """
+        with self.cond:
+            self.closed = True
+            # drop the part of the spill file that was already read back
+            if (self.spill_pending and self.spill_offset):
+                temp_filespec = self.spill_filespec + '.tmp'
+                with open(self.spill_filespec, 'r', encoding='utf-8') as f:
+                    f.seek(self.spill_offset)
+                    with open(temp_filespec, 'w', encoding='utf-8') as temp:
+                        temp.write(f.read())
+                os.replace(temp_filespec, self.spill_filespec)
+            self.spill_pending = 0
+            self.spill_offset = 0
+            self.cond.notify_all()
+
+    def get_depth(self):
+        """
+        Returns the number of tweets in memory waiting for a worker
+        """
+        with self.cond:
+            return len(self.items)
+
+    def get_stats(self):
+        """
+        Returns a dict of the queue metrics, and resets the high-water mark
+        and the counters
+        """
+        with self.cond:
+            stats = {'depth': len(self.items),
+                     'high_water': self.high_water,
+                     'put': self.num_put,
+                     'dropped': self.num_dropped,
+                     'spilled': self.num_spilled,
+                     'blocked': self.num_blocked,
+                     'spill_pending': self.spill_pending}
+            self.high_water = len(self.items)
+            self.num_put = 0
+            self.num_dropped = 0
+            self.num_spilled = 0
+            self.num_blocked = 0
+
+        return stats
+
+
+def log_queue_stats(tweet_queue, logger, interval, stop_event):
+    """
+    Logs the queue metrics every interval seconds until stop_event is set
+    (runs in its own thread)
+    """
+    while not stop_event.wait(interval):
+        stats = tweet_queue.get_stats()
+        log_msg = ('queue depth: {}  high-water: {}  queued: {}  dropped: {}'
+                   '  spilled: {}  blocked: {}  spill pending: {}')
+        log_msg = log_msg.format(stats['depth'], stats['high_water'],
+                                 stats['put'], stats['dropped'],
+                                 stats['spilled'], stats['blocked'],
+                                 stats['spill_pending'])
+        if (stats['dropped'] or stats['spilled'] or stats['blocked']):
+            logger.warning(log_msg)
+        else:
+            logger.info(log_msg)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import gzip
+import json
+import time
+import datetime
+
+# .zst archives (written by the archive sink when zstandard is installed)
+# can only be read with zstandard
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+Twitter2Pg_replay_funcs.py - Reads recorded tweet archives (one tweet JSON
+                             object per line, optionally compressed) for the
+                             --from-file mode of Twitter2Pg, which feeds them
+                             through the same pipeline as the live stream
+"""
+
+
+def open_archive(filespec):
+    """
+    Opens an archive for reading text, gzip'd, zstd compressed or not (by
+    the .gz or .zst extension)
+    filespec: archive file
+    """
+    if filespec.endswith('.zst'):
+        if zstandard is None:
+            raise IOError('the zstandard package is needed to read ' + filespec)
+        return zstandard.open(filespec, 'rt', encoding='utf-8')
+    if filespec.endswith('.gz'):
+        return gzip.open(filespec, 'rt', encoding='utf-8')
+    return open(filespec, 'r', encoding='utf-8')
+
+
+def get_tweet_time(line):
+    """
+    Returns the time of a tweet in epoch seconds, from timestamp_ms when
+    present and otherwise created_at, or None if the line has neither
+    (e.g. a delete notice).
+    line: one line of the archive
+    """
+    try:
+        tweet = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(tweet, dict):
+        return None
+    if tweet.get('timestamp_ms') is not None:
+        return int(tweet['timestamp_ms']) / 1000.0
+    if tweet.get('created_at') is not None:
+        created_at = datetime.datetime.strptime(tweet['created_at'],
+                                                '%a %b %d %H:%M:%S %z %Y')
+        return created_at.timestamp()
+    return None
+
+
+class ArchiveReplay(object):
+    """
+    Passes the lines of archives to put (the queue the stream normally
+    fills).  With speed 0 the lines are passed as fast as put takes them;
+    otherwise they are paced by the tweet times, speed times faster than
+    they were recorded (1 = original speed).  The pacing carries over from
+    one archive to the next, so a day split over hourly files replays as
+    one stream.
+    put: function taking one line of raw tweet data
+    speed: float, replay speed multiple (0 for no pacing)
+    logger: logger object
+    """
+
+    def __init__(self, put, speed, logger):
+        self.put = put
+        self.speed = speed
+        self.logger = logger
+        self.first_tweet_time = None
+        self.start_time = None
+
+    def replay(self, filespec):
+        """
+        Replays one archive.  Returns the number of lines passed to put.
+        """
+        num_lines = 0
+        with open_archive(filespec) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if self.speed > 0:
+                    self.pace(line)
+                self.put(line)
+                num_lines = num_lines + 1
+
+        log_msg = 'replayed {} lines from {}'
+        log_msg = log_msg.format(num_lines, filespec)
+        self.logger.info(log_msg)
+        return num_lines
+
+    def pace(self, line):
+        # wait until the tweet is due, relative to the first tweet
+        tweet_time = get_tweet_time(line)
+        if tweet_time is None:
+            return
+        if self.first_tweet_time is None:
+            self.first_tweet_time = tweet_time
+            self.start_time = time.monotonic()
+            return
+        due = self.start_time + (tweet_time - self.first_tweet_time) / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+import re
+import time
+import zlib
+import threading
+
+"""
+Twitter2Pg_shard_funcs.py - Keyword sharding.  With --shard i/N, N copies of
+                            Twitter2Pg each open their own stream, tracking
+                            the keywords whose crc32 falls in their shard,
+                            and write into the same message table.  A tweet
+                            with keywords of several shards is delivered to
+                            each of them; it is kept by the lowest shard
+                            sure to receive and accept it, so the others
+                            drop it before any database work.
+"""
+
+SHARD_REGEX = re.compile(r'^(\d+)/(\d+)$')
+
+# the time of a tweet, read from the raw payload
+TIMESTAMP_REGEX = re.compile(r'"timestamp_ms"\s*:\s*"(\d+)"')
+
+
+def parse_shard(text):
+    """
+    Parses the --shard argument 'i/N' (shard i of N, 1 <= i <= N).  Returns
+    (i, N), or raises ValueError.
+    """
+    m = SHARD_REGEX.match(text)
+    if m is None:
+        raise ValueError("a shard is given as i/N, e.g. 2/4")
+    index = int(m.group(1))
+    num_shards = int(m.group(2))
+    if not 1 <= index <= num_shards:
+        raise ValueError("shard i/N needs 1 <= i <= N")
+
+    return index, num_shards
+
+
+def get_shard(keyword, num_shards):
+    """
+    Returns the shard (1 to num_shards) a keyword belongs to.  crc32 is the
+    same in every process and on every host, unlike hash().
+    """
+    return zlib.crc32(keyword.encode('utf-8')) % num_shards + 1
+
+
+def split_keywords(keywords, index, num_shards):
+    """
+    Splits the keywords into those of shard index and those of the shards
+    before it (which own the tweets they share with this shard)
+    """
+    own = []
+    lower = []
+    for keyword in keywords:
+        shard = get_shard(keyword, num_shards)
+        if shard == index:
+            own.append(keyword)
+        elif shard < index:
+            lower.append(keyword)
+
+    return own, lower
+
+
+def get_shard_suffix(index, num_shards):
+    """
+    Returns the suffix added to the log, spill, spool and archive names of
+    a shard, so shards can run from the same directory
+    """
+    return '_{}of{}'.format(index, num_shards)
+
+
+def add_suffix(name, suffix):
+    """
+    Adds the suffix to a file name, before the extension (Twitter2Pg.log
+    becomes Twitter2Pg_2of4.log)
+    """
+    root, dot, extension = name.rpartition('.')
+    if not dot:
+        return name + suffix
+    return root + suffix + '.' + extension
+
+
+class ShardStats(object):
+    """
+    Throughput and lag of a shard's stream: the payloads received, and how
+    far behind their timestamp_ms they arrived
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.num_received = 0
+        self.num_timed = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def add(self, data):
+        """
+        Counts one payload (called by the stream thread)
+        """
+        m = TIMESTAMP_REGEX.search(data)
+        lag = None
+        if m is not None:
+            lag = time.time() - int(m.group(1)) / 1000.0
+        with self.lock:
+            self.num_received = self.num_received + 1
+            if lag is not None:
+                self.num_timed = self.num_timed + 1
+                self.total_lag = self.total_lag + lag
+                self.max_lag = max(self.max_lag, lag)
+
+    def get_stats(self):
+        """
+        Returns a dict of the rate (payloads per second) and the mean and
+        maximum lag (seconds) since the last call, and resets them
+        """
+        with self.lock:
+            now = time.time()
+            stats = {'received': self.num_received,
+                     'rate': self.num_received / max(now - self.start, 0.001),
+                     'mean_lag': None,
+                     'max_lag': None}
+            if self.num_timed:
+                stats['mean_lag'] = self.total_lag / self.num_timed
+                stats['max_lag'] = self.max_lag
+            self.start = now
+            self.num_received = 0
+            self.num_timed = 0
+            self.total_lag = 0.0
+            self.max_lag = 0.0
+
+        return stats
+
+
+def log_shard_stats(shard_stats, shard, logger, interval, stop_event):
+    """
+    Logs the shard's throughput and lag every interval seconds until
+    stop_event is set (runs in its own thread)
+    shard: the shard, as given to --shard
+    """
+    while not stop_event.wait(interval):
+        stats = shard_stats.get_stats()
+        if stats['mean_lag'] is None:
+            log_msg = 'shard {}: received {} ({:.1f}/s)  lag: n/a'
+            log_msg = log_msg.format(shard, stats['received'], stats['rate'])
+        else:
+            log_msg = 'shard {}: received {} ({:.1f}/s)  lag: mean {:.2f} s  max {:.2f} s'
+            log_msg = log_msg.format(shard, stats['received'], stats['rate'],
+                                     stats['mean_lag'], stats['max_lag'])
+        logger.info(log_msg)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import time
+import threading
+import psycopg2
+
+"""
+Twitter2Pg_shed_funcs.py - Load shedding for tweet floods.  When the queue
+                           or the database falls behind, the tweets tedect
+                           counts (candidates) are still all stored, and the
+                           others are sampled or sent to the spool for later,
+                           so the counts arrive on time when they matter
+                           most.  Every second spent shedding is recorded in
+                           the ingest_degraded table.
+"""
+
+SHED_MODES = ['sample', 'spool']
+
+# the decisions of LoadShedder.shed
+KEEP = 'keep'
+DROP = 'drop'
+DEFER = 'defer'
+
+
+class LoadShedder(object):
+    """
+    Checks the queue depth and the writer latency every second from a
+    background thread.  Shedding starts when either reaches its threshold,
+    and stops once both are below half of it.  While shedding, shed()
+    keeps every candidate tweet and every sample_every'th other tweet; the
+    rest are dropped (mode sample) or deferred to the spool (mode spool,
+    whose draining is held until the shedding stops).
+    db: Database object (the pool the writer uses)
+    logger: logger object
+    get_queue_depth: function returning the number of tweets queued
+    get_latency: function returning the writer latency in seconds
+    queue_depth: int, queue depth threshold
+    latency: float, writer latency threshold in seconds
+    sample_every: int, keep 1 in sample_every non-candidates (0 for none)
+    mode: one of SHED_MODES
+    spool: Spool object (mode spool)
+    """
+
+    def __init__(self, db, logger, get_queue_depth, get_latency,
+                 queue_depth, latency, sample_every, mode, spool=None):
+        self.db = db
+        self.logger = logger
+        self.get_queue_depth = get_queue_depth
+        self.get_latency = get_latency
+        self.queue_depth = queue_depth
+        self.latency = latency
+        self.sample_every = sample_every
+        self.mode = mode
+        self.spool = spool
+        self.shedding = False
+        self.started = None
+        self.lock = threading.Lock()
+        self.num_seen = 0
+        self.num_kept = 0
+        self.num_shed = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='LoadShedder')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def shed(self, msg_dict):
+        """
+        Returns KEEP, DROP or DEFER for an accepted message
+        """
+        if not self.shedding:
+            return KEEP
+        with self.lock:
+            self.num_seen = self.num_seen + 1
+            if (msg_dict['is_candidate'] == 'True'
+                or (self.sample_every > 0
+                    and self.num_seen % self.sample_every == 0)):
+                self.num_kept = self.num_kept + 1
+                return KEEP
+            self.num_shed = self.num_shed + 1
+        if self.mode == 'spool':
+            return DEFER
+        return DROP
+
+    def run(self):
+        while not self.stop_event.wait(1.0):
+            depth = self.get_queue_depth()
+            latency = self.get_latency()
+            if (not self.shedding
+                and (depth >= self.queue_depth or latency >= self.latency)):
+                self.set_shedding(True)
+                self.started = time.time()
+                log_msg = ('load shedding started - queue depth {}, writer'
+                           ' latency {} ms')
+                log_msg = log_msg.format(depth, int(latency * 1000))
+                self.logger.warning(log_msg)
+            elif (self.shedding and depth < self.queue_depth / 2
+                  and latency < self.latency / 2):
+                self.set_shedding(False)
+                log_msg = 'load shedding stopped after {} seconds'
+                log_msg = log_msg.format(int(time.time() - self.started))
+                self.logger.warning(log_msg)
+            elif not self.shedding:
+                continue
+            with self.lock:
+                num_kept = self.num_kept
+                num_shed = self.num_shed
+                self.num_kept = 0
+                self.num_shed = 0
+            self.record(time.time(), depth, latency, num_kept, num_shed)
+
+    def set_shedding(self, shedding):
+        self.shedding = shedding
+        if self.spool is not None:
+            self.spool.hold_drain(shedding)
+
+    def record(self, now, depth, latency, num_kept, num_shed):
+        """
+        Records one degraded second in ingest_degraded (UTC, like
+        twitter_date).  A failure is logged and the second is lost - it
+        must not hold up the shedding.
+        """
+        query = ("INSERT INTO ingest_degraded (second, queue_depth,"
+                 " latency_ms, kept, shed, mode)"
+                 " VALUES (date_trunc('second', timezone('UTC', to_timestamp(%s))),"
+                 " %s, %s, %s, %s, %s)"
+                 " ON CONFLICT (second) DO UPDATE"
+                 " SET kept = ingest_degraded.kept + EXCLUDED.kept,"
+                 " shed = ingest_degraded.shed + EXCLUDED.shed")
+        try:
+            self.db.execute(query, (now, depth, int(latency * 1000), num_kept,
+                                    num_shed, self.mode), retries=1)
+        except (Exception, psycopg2.DatabaseError) as e:
+            log_msg = 'Error {} recording a degraded second in ingest_degraded'
+            log_msg = log_msg.format(e)
+            self.logger.error(log_msg)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.spool is not None:
+            self.spool.hold_drain(False)
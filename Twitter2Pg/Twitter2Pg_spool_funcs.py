@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+import os
+import glob
+import time
+import struct
+import zlib
+import threading
+
+"""
+Twitter2Pg_spool_funcs.py - Durable local spool for message rows that can't
+                            be written to the database right away (the
+                            database is down, or the writer has fallen too
+                            far behind).  Rows are appended to segment files
+                            and loaded into the message table by a background
+                            drainer once the database accepts them again.
+
+Segment format: a sequence of records, each an 8 byte header - payload
+length and crc32 of the payload (big-endian unsigned ints) - followed by the
+payload, the utf-8 of 'twitter_id<TAB>VALUES tuple'.  Segments are named
+spool_<sequence number>.seg and are only appended to; a segment is deleted
+once all of its rows are in the database.  Loading is idempotent (the insert
+is ON CONFLICT DO NOTHING on twitter_id), so a segment that was partly
+loaded before a crash is simply loaded again.
+"""
+
+HEADER = struct.Struct('>II')
+
+
+def read_segment(filespec):
+    """
+    Reads the records of a segment.  Returns the list of
+    (twitter_id, values) and whether the segment ended cleanly (False if
+    the last record is torn or fails its crc, e.g. after a power loss).
+    filespec: segment file
+    """
+    rows = []
+    with open(filespec, 'rb') as f:
+        data = f.read()
+
+    pos = 0
+    while pos < len(data):
+        if pos + HEADER.size > len(data):
+            return rows, False
+        length, crc = HEADER.unpack_from(data, pos)
+        payload = data[pos + HEADER.size:pos + HEADER.size + length]
+        if (len(payload) != length or zlib.crc32(payload) != crc):
+            return rows, False
+        twitter_id, values = payload.decode('utf-8').split('\t', 1)
+        rows.append((twitter_id, values))
+        pos = pos + HEADER.size + length
+
+    return rows, True
+
+
+class Spool(object):
+    """
+    Appends rows to the current segment, rotating to a new segment at
+    segment_bytes, and fsyncs in groups - at most every fsync_interval
+    seconds - so a burst of rows costs one fsync, not one per row.  A
+    drainer thread loads the closed segments, oldest first, every
+    drain_interval seconds (unless draining is held - hold_drain - e.g.
+    while load shedding).
+    directory: spool directory (created if needed)
+    logger: logger object
+    segment_bytes: int, size at which a segment is closed
+    fsync_interval: float, longest a row may wait for its fsync
+    drain_interval: float, seconds between drain attempts
+    load: function that writes a list of (twitter_id, values) rows to the
+          database, returning False if the database couldn't be reached
+    batch_size: int, rows per load
+    """
+
+    def __init__(self, directory, logger, segment_bytes, fsync_interval,
+                 drain_interval, load, batch_size):
+        self.directory = directory
+        self.logger = logger
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.drain_interval = drain_interval
+        self.load = load
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.file = None
+        self.file_size = 0
+        self.last_fsync = 0.0
+        self.unsynced = False
+        self.last_append = 0.0
+        self.last_drain = 0.0
+        self.drain_held = False
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='SpoolDrainer')
+        self.thread.daemon = True
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # segments left by an earlier run are drained first
+        segments = self.get_segments()
+        self.sequence = 0
+        if segments:
+            self.sequence = int(os.path.basename(segments[-1])[6:-4])
+
+    def get_segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'spool_*.seg')))
+
+    def start(self):
+        self.thread.start()
+
+    def append(self, rows):
+        """
+        Adds rows (list of (twitter_id, values)) to the spool
+        """
+        with self.lock:
+            if self.file is None:
+                self.sequence = self.sequence + 1
+                filespec = os.path.join(self.directory,
+                                        'spool_{:012d}.seg'.format(self.sequence))
+                self.file = open(filespec, 'ab')
+                self.file_size = 0
+            for twitter_id, values in rows:
+                payload = (twitter_id + '\t' + values).encode('utf-8')
+                record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+                self.file.write(record)
+                self.file_size = self.file_size + len(record)
+            self.last_append = time.monotonic()
+            self.unsynced = True
+            if time.monotonic() - self.last_fsync >= self.fsync_interval:
+                self.sync()
+            if self.file_size >= self.segment_bytes:
+                self.close_segment()
+
+    def sync(self):
+        # called with the lock held
+        if (self.file is not None and self.unsynced):
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+        self.last_fsync = time.monotonic()
+
+    def hold_drain(self, held):
+        """
+        Holds (True) or resumes (False) the loading of the segments
+        """
+        self.drain_held = held
+
+    def close_segment(self):
+        # called with the lock held - the segment can now be drained
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def run(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            with self.lock:
+                self.sync()
+                # close the current segment once nothing has been added
+                # for a drain interval, so its rows don't wait for it to fill
+                if (self.file is not None
+                    and time.monotonic() - self.last_append >= self.drain_interval):
+                    self.close_segment()
+            if (not self.drain_held
+                and time.monotonic() - self.last_drain >= self.drain_interval):
+                self.last_drain = time.monotonic()
+                self.drain()
+
+    def drain(self):
+        """
+        Loads the closed segments into the database, oldest first.  Stops
+        at the first database error - the segment is retried next time.
+        """
+        with self.lock:
+            current = None
+            if self.file is not None:
+                current = self.file.name
+        for filespec in self.get_segments():
+            if filespec == current or self.stop_event.is_set():
+                break
+            rows, clean = read_segment(filespec)
+            for i in range(0, len(rows), self.batch_size):
+                if not self.load(rows[i:i + self.batch_size]):
+                    log_msg = 'could not load spool segment {} - will retry'
+                    log_msg = log_msg.format(filespec)
+                    self.logger.error(log_msg)
+                    return
+            if not clean:
+                log_msg = ('spool segment {} ends with a damaged record - the'
+                           ' {} rows before it were loaded, the segment is'
+                           ' kept as .bad')
+                log_msg = log_msg.format(filespec, len(rows))
+                self.logger.error(log_msg)
+                os.rename(filespec, filespec[:-4] + '.bad')
+            else:
+                os.remove(filespec)
+            log_msg = 'loaded {} spooled messages from {}'
+            log_msg = log_msg.format(len(rows), filespec)
+            self.logger.info(log_msg)
+
+    def stop(self):
+        """
+        Stops the drainer and syncs the current segment - whatever is still
+        spooled is loaded on the next start
+        """
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        with self.lock:
+            self.close_segment()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+import re
+import threading
+import psycopg2
+
+# local objects
+from Twitter2Pg_filter_funcs import get_alternation
+
+"""
+Twitter2Pg_translate_funcs.py - In-memory index of the
+                                foreign_location_translations table, used to
+                                translate the location_string of tweets in
+                                the languages listed in
+                                foreign_location_translations (in the
+                                [TWITTER] section of Twitter2Pg.ini)
+"""
+
+
+def build_matcher(rows):
+    """
+    Compiles the rows of one language into a single regular expression
+    that finds, at every position of the string, the longest alias
+    starting there (the aliases are arranged as a trie, see
+    get_alternation).  The aliases starting at a position are that alias
+    and the aliases it starts with, and each alias maps to the first row
+    (in priority order) that has it, so one scan of the string gives the
+    same answer as testing the rows one at a time.
+    rows: list of (english_translation, aliases) in priority order, aliases
+          a comma-separated string
+    Returns the compiled pattern, the dict of alias -> row index, and the
+    list of translations, indexed by row index
+    """
+    alias_rows = {}
+    translations = []
+    for english_translation, aliases in rows:
+        if aliases is None:
+            continue
+        for alias in aliases.split(","):
+            alias_rows.setdefault(alias, len(translations))
+        translations.append(english_translation)
+    if not alias_rows:
+        return None, alias_rows, translations
+
+    # a lookahead, so aliases that overlap are all found
+    pattern = get_alternation(sorted(alias_rows)).pattern
+    pattern = re.compile('(?=(' + pattern + '))', re.DOTALL)
+    return pattern, alias_rows, translations
+
+
+class LocationTranslator(object):
+    """
+    Holds a matcher per language, built from the foreign_location_translations
+    table, and rebuilds them every refresh_interval seconds from a
+    background thread so table edits are picked up without a restart.
+    db: Database object
+    logger: logger object
+    langs: list of Twitter lang codes to load
+    refresh_interval: float, seconds between reloads of the table
+    """
+
+    def __init__(self, db, logger, langs, refresh_interval):
+        self.db = db
+        self.logger = logger
+        self.langs = langs
+        self.refresh_interval = refresh_interval
+        self.matchers = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='LocationTranslator')
+        self.thread.daemon = True
+
+    def start(self):
+        self.load()
+        self.thread.start()
+
+    def load(self):
+        """
+        Reads the table and replaces the matchers.  On a database error the
+        current matchers are kept (the database is tried once - the next
+        reload tries again).
+        """
+        query = ("SELECT lang, english_translation, aliases"
+                 " FROM foreign_location_translations"
+                 " WHERE lang IN %s ORDER BY lang, priority")
+        try:
+            rows = self.db.execute(query, (tuple(self.langs),), fetch='all',
+                                   retries=1)
+        except (Exception, psycopg2.DatabaseError) as e:
+            log_msg = ("error '{}' loading foreign_location_translations -"
+                       " keeping the current translations")
+            log_msg = log_msg.format(e)
+            self.logger.error(log_msg)
+            return
+
+        lang_rows = {}
+        for lang, english_translation, aliases in rows:
+            lang_rows.setdefault(lang, []).append((english_translation, aliases))
+        matchers = {}
+        for lang in lang_rows:
+            matchers[lang] = build_matcher(lang_rows[lang])
+        # one assignment, so the workers see either the old or new matchers
+        self.matchers = matchers
+
+        log_msg = 'loaded {} foreign_location_translations rows for {}'
+        log_msg = log_msg.format(len(rows), ', '.join(sorted(matchers)))
+        self.logger.debug(log_msg)
+
+    def run(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            self.load()
+
+    def translate(self, lang, location_string):
+        """
+        Returns the english translation for the location_string, or None
+        if no alias of the lang is in it
+        """
+        pattern, alias_rows, translations = self.matchers.get(lang, (None, None, None))
+        if pattern is None:
+            return None
+        best = None
+        for m in pattern.finditer(location_string):
+            alias = m.group(1)
+            for length in range(len(alias) + 1):
+                row = alias_rows.get(alias[:length])
+                if (row is not None and (best is None or row < best)):
+                    best = row
+            if best == 0:
+                break
+        if best is None:
+            return None
+        return translations[best]
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+import time
+import threading
+import psycopg2
+
+"""
+Twitter2Pg_writer_funcs.py - Buffers the rows bound for the message table
+                             and writes them in batches.  Each batch is one
+                             statement that inserts the tweets and adds the
+                             candidates among them to the one second
+                             message_counts rollup tedect reads
+"""
+
+# columns of the message table, in the order of the VALUES tuples
+MESSAGE_COLUMNS = ['date_created',
+                   'twitter_id',
+                   'twitter_date',
+                   'to_be_geo_located',
+                   'text',
+                   'location_string',
+                   'opt_location_string',
+                   'orig_location_string',
+                   'location_type',
+                   'location',
+                   'in_reply_to_message_id',
+                   'lang',
+                   'media_display_url',
+                   'media_type',
+                   'time_zone',
+                   'word_count',
+                   'is_candidate']
+
+
+def get_message_values(msg_dict):
+    """
+    Formats the VALUES tuple for one message.  The msg_dict values are
+    already SQL literals (quoted text, NULL, st_SetSrid(...)), except
+    twitter_date, which is the created_at field of the tweet, and
+    date_created.  date_created is set to the time the message was
+    formatted rather than now(), so a row that is spooled and loaded later
+    still records when the tweet was received.  The column default of
+    date_inserted records when it was written.
+    msg_dict: message dictionary built by load_message_dict
+    """
+    values = []
+    for column in MESSAGE_COLUMNS:
+        if column == 'twitter_date':
+            value = "to_timestamp('{}','Dy Mon DD HH24:MI:SS SSSS YYYY')"
+            values.append(value.format(msg_dict[column]))
+        elif (column == 'date_created' and msg_dict[column] == 'now()'):
+            value = "to_timestamp({:.6f})::timestamp"
+            values.append(value.format(time.time()))
+        else:
+            values.append(msg_dict[column])
+
+    return '(' + ', '.join(values) + ')'
+
+
+def get_insert_query(values):
+    """
+    Builds the statement that writes a batch.  The message rows that were
+    actually inserted (ON CONFLICT DO NOTHING skips duplicates) are
+    returned by the CTE, and the candidates among them are added to
+    message_counts, so the rollup can't count a tweet twice or miss one.
+    values: list of VALUES tuples from get_message_values
+    """
+    query = ("WITH ins AS ("
+             " INSERT INTO message (" + ', '.join(MESSAGE_COLUMNS) + ")"
+             " VALUES " + ', '.join(values) +
+             " ON CONFLICT DO NOTHING"
+             " RETURNING twitter_date, is_candidate)"
+             " INSERT INTO message_counts (second, count)"
+             " SELECT date_trunc('second', twitter_date), count(*)"
+             " FROM ins WHERE is_candidate GROUP BY 1"
+             " ON CONFLICT (second) DO UPDATE"
+             " SET count = message_counts.count + EXCLUDED.count")
+
+    return query
+
+
+class MessageWriter(object):
+    """
+    Accumulates message rows and writes them from a background thread,
+    batch_size rows at a time, as soon as batch_size rows are waiting or
+    the oldest waiting row is flush_interval seconds old.  Each batch is a
+    single statement, so it's one round trip and one commit.  tedect
+    counts a bin once bin_load_delay has passed, so flush_interval has to
+    stay well below that (and tedect's bin_length).
+    With a spool (set_spool), batches that can't be written because the
+    database is down go to the spool instead of staying in memory, and so
+    do new rows while more than spool_threshold rows are waiting.
+    db: Database object (Twitter2Pg_db_funcs) - a statement is tried
+        once, as the writer decides what to do with a batch that couldn't
+        be written (a lost connection is replaced on the next write)
+    logger: logger object
+    batch_size: int, most rows written in one statement
+    flush_interval: float, seconds a row may wait before being written
+    max_pending: int, most rows kept while the database is unreachable
+                 (the oldest are dropped beyond that)
+    """
+
+    def __init__(self, db, logger, batch_size, flush_interval, max_pending):
+        self.db = db
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rows = []
+        self.first_time = None
+        self.last_write_time = 0.0
+        self.stopping = False
+        self.spool = None
+        self.spool_threshold = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='MessageWriter')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def set_spool(self, spool, spool_threshold):
+        self.spool = spool
+        self.spool_threshold = spool_threshold
+
+    def add(self, msg_dict):
+        """
+        Queues one message (a message dictionary) for the next batch
+        """
+        row = (msg_dict['twitter_id'], get_message_values(msg_dict))
+        with self.cond:
+            if (self.spool is not None
+                and len(self.rows) >= self.spool_threshold):
+                # the writer is behind - let the spool take the overflow
+                self.spool.append([row])
+                return
+            if not self.rows:
+                self.first_time = time.monotonic()
+            self.rows.append(row)
+            # wake the writer for the first row (it then waits out the
+            # flush interval) and for a full batch
+            if (len(self.rows) == 1 or len(self.rows) >= self.batch_size):
+                self.cond.notify()
+
+    def get_latency(self):
+        """
+        Returns how far behind the writer is, in seconds: the longer of how
+        long the oldest waiting row has waited beyond flush_interval, and
+        how long the last batch took to write
+        """
+        with self.cond:
+            waited = 0.0
+            if self.rows:
+                waited = time.monotonic() - self.first_time - self.flush_interval
+
+        return max(waited, self.last_write_time)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.rows and not self.stopping:
+                    self.cond.wait()
+                if not self.rows:
+                    break
+                # wait for a full batch or for the oldest row to come due
+                deadline = self.first_time + self.flush_interval
+                while (len(self.rows) < self.batch_size
+                       and not self.stopping):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                rows = self.rows[:self.batch_size]
+                del self.rows[:self.batch_size]
+                if self.rows:
+                    self.first_time = time.monotonic()
+            if not self.write(rows):
+                if self.spool is not None:
+                    self.spool.append(rows)
+                    log_msg = 'spooled {} messages'
+                    log_msg = log_msg.format(len(rows))
+                    self.logger.warning(log_msg)
+                    rows = []
+                else:
+                    self.requeue(rows)
+                # give the database a moment before retrying
+                with self.cond:
+                    if not self.stopping:
+                        self.cond.wait(self.flush_interval)
+                    elif self.spool is not None:
+                        # shutting down - the spool keeps the rest for
+                        # the next start
+                        self.spool.append(self.rows)
+                        log_msg = 'shutting down - spooled {} messages'
+                        log_msg = log_msg.format(len(self.rows))
+                        self.logger.warning(log_msg)
+                        self.rows = []
+                        break
+                    else:
+                        log_msg = 'shutting down - {} messages not written'
+                        log_msg = log_msg.format(len(self.rows))
+                        self.logger.error(log_msg)
+                        break
+
+    def write(self, rows):
+        """
+        Writes one batch.  If the statement fails for a reason other than
+        the connection, the rows are written one at a time so a single bad
+        row is logged and dropped without losing the rest of the batch.
+        Returns False if the database couldn't be reached (the rows should
+        be retried).
+        """
+        start = time.monotonic()
+        try:
+            self.execute([values for twitter_id, values in rows])
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            log_msg = 'Error {} writing {} messages - will retry'
+            log_msg = log_msg.format(e, len(rows))
+            self.logger.error(log_msg)
+            return False
+        except (Exception, psycopg2.DatabaseError) as e:
+            log_msg = 'Error {} writing {} messages - writing them one at a time'
+            log_msg = log_msg.format(e, len(rows))
+            self.logger.error(log_msg)
+            for twitter_id, values in rows:
+                try:
+                    self.execute([values])
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    return False
+                except (Exception, psycopg2.DatabaseError) as e:
+                    log_msg = 'Error {} inserting twitter_id = {} - discarding'
+                    log_msg = log_msg.format(e, twitter_id)
+                    self.logger.error(log_msg)
+            return True
+
+        self.last_write_time = time.monotonic() - start
+        log_msg = 'wrote {} messages in {} ms'
+        log_msg = log_msg.format(len(rows), int(self.last_write_time * 1000))
+        self.logger.debug(log_msg)
+        return True
+
+    def execute(self, values):
+        # the VALUES differ from batch to batch, so the statement can't be
+        # prepared on the server
+        self.db.execute(get_insert_query(values), retries=1)
+
+    def requeue(self, rows):
+        """
+        Puts a batch that couldn't be written back at the front of the
+        queue, dropping the oldest rows beyond max_pending
+        """
+        with self.cond:
+            self.rows[0:0] = rows
+            self.first_time = time.monotonic()
+            if len(self.rows) > self.max_pending:
+                num_dropped = len(self.rows) - self.max_pending
+                del self.rows[:num_dropped]
+                log_msg = 'writer backlog over {} messages - dropped the oldest {}'
+                log_msg = log_msg.format(self.max_pending, num_dropped)
+                self.logger.error(log_msg)
+
+    def stop(self):
+        """
+        Stops the background thread once the waiting rows are written (or
+        the database can't be reached)
+        """
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread.is_alive():
+            self.thread.join()
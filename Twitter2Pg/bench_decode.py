@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import json
+import random
+from argparse import ArgumentParser
+
+# Local imports
+from Twitter2Pg_decode_funcs import get_available_decoders, get_decoder
+from Twitter2Pg_filter_funcs import TweetFilter
+from Twitter2Pg_replay_funcs import open_archive
+
+"""
+bench_decode.py - Microbenchmark of the Twitter2Pg decode path.  Times each
+                  installed JSON decoder on a corpus of raw tweets, with and
+                  without the keyword precheck on the raw data, and checks
+                  that the precheck never rejects a tweet the filter would
+                  have kept.  The corpus is recorded tweets (archives as
+                  written by the [ARCHIVE] sink, .jsonl/.gz/.zst) or, without
+                  --corpus, synthetic tweets of a realistic size.  No database
+                  or Twitter connection needed.
+
+                  usage: python bench_decode.py [--corpus FILE ...]
+                                                [--tweets N]
+                                                [--keywords WORD,WORD...]
+"""
+
+# the kind of keywords tracked, in a few languages
+BASE_KEYWORDS = ['earthquake', 'quake', 'sismo', 'temblor', 'terremoto',
+                 'gempa', 'deprem', 'lindol', 'seisme', 'Erdbeben',
+                 'tremor', 'shaking', 'aftershock', 'tsunami', '地震']
+
+WORDS = ['the', 'house', 'just', 'felt', 'big', 'a', 'in', 'was', 'wow',
+         'RT', 'http://t.co/abc', 'strong', 'here', 'now', 'city', 'my',
+         'we', 'so', 'scary', 'ok', 'lol', 'song', 'drill', 'everyone',
+         'safe', '?', '!!', '@user', 'café', 'ça', 'mañana', '東京']
+
+
+def load_corpus(filespecs):
+    lines = []
+    for filespec in filespecs:
+        with open_archive(filespec) as f:
+            for line in f:
+                if line.strip():
+                    lines.append(line)
+
+    return lines
+
+
+def make_tweets(num_tweets, keywords):
+    """
+    Synthetic stream payloads - ensure_ascii, as the stream sends them, with
+    the user object and entities that make up most of a real payload
+    """
+    random.seed(1)
+    lines = []
+    for i in range(num_tweets):
+        words = random.sample(WORDS, random.randint(2, 12))
+        # about 1 in 10 tweets carries a keyword
+        if random.random() < 0.10:
+            words.insert(random.randint(0, len(words)), random.choice(keywords))
+        twitter_id = 1000000000000000000 + i
+        tweet = {'created_at': 'Mon Oct 19 12:00:00 +0000 2026',
+                 'id': twitter_id, 'id_str': str(twitter_id),
+                 'text': ' '.join(words), 'lang': random.choice(['en', 'es', 'ja']),
+                 'source': '<a href="http://twitter.com/download/iphone" '
+                           'rel="nofollow">Twitter for iPhone</a>',
+                 'truncated': False, 'geo': None, 'coordinates': None,
+                 'place': None, 'retweet_count': 0, 'favorite_count': 0,
+                 'user': {'id': i, 'id_str': str(i),
+                          'name': 'user ' + str(i),
+                          'screen_name': 'user' + str(i),
+                          'location': random.choice(['', 'Los Angeles, CA',
+                                                     'Ciudad de México',
+                                                     'Tokyo']),
+                          'description': ' '.join(random.sample(WORDS, 8)),
+                          'followers_count': random.randint(0, 5000),
+                          'friends_count': random.randint(0, 5000),
+                          'created_at': 'Tue Mar 03 10:00:00 +0000 2015',
+                          'time_zone': None, 'lang': None,
+                          'profile_image_url': 'http://pbs.twimg.com/profile_images/'
+                                               + str(i) + '/a_normal.jpg'},
+                 'entities': {'hashtags': [], 'urls': [], 'user_mentions': [],
+                              'symbols': []},
+                 'timestamp_ms': str(1792411200000 + i)}
+        lines.append(json.dumps(tweet) + '\r\n')
+
+    return lines
+
+
+def get_text(tweet):
+    # the text as Twitter2Pg's load_message_dict hands it to the filter
+    if (not isinstance(tweet, dict) or tweet.get('text') is None):
+        return None
+    return '$$' + tweet['text'].replace('$', '') + '$$'
+
+
+def time_decoder(decode, tweet_filter, lines, precheck):
+    start = time.perf_counter()
+    kept = 0
+    for data in lines:
+        if (precheck and not tweet_filter.precheck(data)):
+            continue
+        try:
+            text = get_text(decode(data))
+        except ValueError:
+            continue
+        if (text is not None and tweet_filter.check(text) is None):
+            kept = kept + 1
+    elapsed = time.perf_counter() - start
+
+    return elapsed, kept
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(prog='bench_decode.py',
+                            description='Times the Twitter2Pg decode path')
+    parser.add_argument('--corpus', nargs='+', metavar='FILE',
+                        help='recorded tweet archives (default synthetic tweets)')
+    parser.add_argument('--tweets', type=int, default=100000,
+                        help='number of synthetic tweets (default 100000)')
+    parser.add_argument('--keywords',
+                        help='comma-separated keywords (default a built-in list)')
+    args = parser.parse_args()
+
+    keywords = BASE_KEYWORDS
+    if args.keywords is not None:
+        keywords = args.keywords.split(',')
+    if args.corpus:
+        lines = load_corpus(args.corpus)
+    else:
+        lines = make_tweets(args.tweets, keywords)
+    if not lines:
+        print('ERROR: the corpus is empty')
+        sys.exit(1)
+    tweet_filter = TweetFilter(keywords, True, 'http,song,drill,predict')
+
+    # the precheck may only reject tweets the filter rejects for having
+    # no keyword
+    passed = 0
+    for data in lines:
+        if tweet_filter.precheck(data):
+            passed = passed + 1
+            continue
+        try:
+            text = get_text(json.loads(data))
+        except ValueError:
+            continue
+        if (text is not None and tweet_filter.keyword_regex is not None
+            and tweet_filter.keyword_regex.search(text) is not None):
+            print('ERROR: the precheck rejected a tweet with a keyword')
+            print(data)
+            sys.exit(1)
+
+    size = sum(len(data) for data in lines) / len(lines)
+    print('{} tweets, average {:.0f} characters, {} keywords'.format(
+          len(lines), size, len(keywords)))
+    print('precheck passes {} tweets ({:.1f}%)'.format(
+          passed, passed * 100.0 / len(lines)))
+    kept_counts = set()
+    for name in get_available_decoders():
+        decoder_name, decode = get_decoder(name)
+        for precheck in [False, True]:
+            elapsed, kept = time_decoder(decode, tweet_filter, lines, precheck)
+            kept_counts.add(kept)
+            label = name + (' + precheck' if precheck else '')
+            print('{:18s} {:8.2f} us/tweet {:12,.0f} tweets/s {:8d} kept'.format(
+                  label, elapsed * 1e6 / len(lines), len(lines) / elapsed, kept))
+    if len(kept_counts) != 1:
+        print('ERROR: the decoders disagree on the tweets kept')
+        sys.exit(1)
+
+    sys.exit(0)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import random
+from argparse import ArgumentParser
+
+# Local imports
+from Twitter2Pg_filter_funcs import TweetFilter
+
+"""
+bench_filter.py - Microbenchmark of the Twitter2Pg tweet filter.  Times the
+                  compiled TweetFilter against the original per-term loops on
+                  a synthetic stream of tweets, and checks that both make the
+                  same decisions.  No database or Twitter connection needed.
+
+                  usage: python bench_filter.py [--tweets N] [--keywords N]
+"""
+
+# the kind of keywords tracked, in a few languages
+BASE_KEYWORDS = ['earthquake', 'quake', 'sismo', 'temblor', 'terremoto',
+                 'gempa', 'deprem', 'lindol', 'seisme', 'Erdbeben',
+                 'tremor', 'shaking', 'aftershock', 'tsunami']
+
+WORDS = ['the', 'house', 'just', 'felt', 'big', 'a', 'in', 'was', 'shaking',
+         'wow', 'RT', 'http://t.co/abc', 'strong', 'here', 'now', 'city',
+         'my', 'we', 'so', 'scary', 'ok', 'lol', 'HTTPS://t.co/x', 'song',
+         'drill', 'everyone', 'safe', '?', '!!', '@user', '#quake']
+
+
+def old_filter(text, filter_list, filter_RT_out, filter_terms_out):
+    """
+    The filter as Twitter2Pg's process_tweet used to run it (one substring
+    test per keyword and per excluded term, re-splitting and lowercasing
+    for every tweet)
+    """
+    add_message = False
+    log_msg = ("reject - no filter terms in tweet")
+    for term in filter_list:
+        if term in text:
+            add_message = True
+            break
+
+    if (add_message is True and filter_RT_out is True):
+        if (text[2:4] == 'RT'):
+            add_message = False
+            log_msg = ("reject - tweet starts with RT")
+
+    if (add_message is True and filter_terms_out is not None):
+        term_list = filter_terms_out.split(",")
+        for term in term_list:
+            if (term.lower() in text.lower()):
+                add_message = False
+                log_msg = ("reject - tweet contains '{}'")
+                log_msg = log_msg.format(term)
+                break
+
+    if add_message:
+        return None
+    return log_msg
+
+
+def make_tweets(num_tweets, keywords):
+    random.seed(1)
+    tweets = []
+    for i in range(num_tweets):
+        words = random.sample(WORDS, random.randint(2, 12))
+        # about 1 in 3 tweets carries a keyword
+        if random.random() < 0.33:
+            words.insert(random.randint(0, len(words)), random.choice(keywords))
+        tweets.append('$$' + ' '.join(words) + '$$')
+
+    return tweets
+
+
+def time_filter(check, tweets):
+    start = time.perf_counter()
+    decisions = [check(text) is None for text in tweets]
+    elapsed = time.perf_counter() - start
+
+    return elapsed, decisions
+
+
+if __name__ == '__main__':
+
+    parser = ArgumentParser(prog='bench_filter.py',
+                            description='Times the Twitter2Pg tweet filter')
+    parser.add_argument('--tweets', type=int, default=100000,
+                        help='number of synthetic tweets (default 100000)')
+    parser.add_argument('--keywords', type=int, default=200,
+                        help='number of keywords (default 200)')
+    args = parser.parse_args()
+
+    # pad the keyword list out to the requested size with variants
+    keywords = list(BASE_KEYWORDS)
+    i = 0
+    while len(keywords) < args.keywords:
+        keywords.append(BASE_KEYWORDS[i % len(BASE_KEYWORDS)] + str(i))
+        i = i + 1
+    filter_terms_out = 'http,song,drill,predict'
+    tweets = make_tweets(args.tweets, keywords)
+
+    old_elapsed, old_decisions = time_filter(
+        lambda text: old_filter(text, keywords, True, filter_terms_out), tweets)
+
+    build_start = time.perf_counter()
+    tweet_filter = TweetFilter(keywords, True, filter_terms_out)
+    build_elapsed = time.perf_counter() - build_start
+    new_elapsed, new_decisions = time_filter(tweet_filter.check, tweets)
+
+    if old_decisions != new_decisions:
+        print('ERROR: the compiled filter disagrees with the original')
+        sys.exit(1)
+
+    print('{} tweets, {} keywords, {} kept'.format(len(tweets), len(keywords),
+                                                   sum(new_decisions)))
+    print('compile time: {:.2f} ms'.format(build_elapsed * 1000))
+    for name, elapsed in [('original loops', old_elapsed),
+                          ('compiled filter', new_elapsed)]:
+        print('{:16s} {:8.2f} us/tweet {:12,.0f} tweets/s'.format(
+              name, elapsed * 1e6 / len(tweets), len(tweets) / elapsed))
+
+    sys.exit(0)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_dedup_funcs.py - Tests functions in ../Twitter2Pg_dedup_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_dedup_funcs import get_raw_twitter_id, RecentIds
+
+
+def test_get_raw_twitter_id():
+    """
+    Test that the tweet's own id_str is read from the raw payload, and
+    that an id_str inside a nested object is not taken for it.
+    """
+    data = '{"created_at": "x", "id": 1095, "id_str": "1095", "user": {"id_str": "7"}}'
+    assert (get_raw_twitter_id(data) == 1095), "Returned incorrect twitter_id!"
+
+    data = '{"created_at": "x", "user": {"id_str": "7"}, "id_str": "1095"}'
+    assert (get_raw_twitter_id(data) is None), "Returned a nested twitter_id!"
+
+    assert (get_raw_twitter_id('{"limit": {"track": 5}}') is None), \
+            "Returned a twitter_id without an id_str!"
+
+    return("Correct twitter_id returned.")
+
+
+def test_recent_ids_rotation():
+    """
+    Test that ids are found in both generations, and that rotating (at
+    max_ids ids, or after window seconds) forgets the previous generation.
+    """
+    recent_ids = RecentIds(3600.0, 2)
+    assert (recent_ids.seen(1) is False), "New id reported as seen!"
+    assert (recent_ids.seen(1) is True), "Duplicate not found!"
+    assert (recent_ids.seen(2) is False), "New id reported as seen!"
+
+    # the current generation is full - 3 starts a new one, and 1 and 2
+    # are still found in the previous one
+    assert (recent_ids.seen(3) is False), "New id reported as seen!"
+    assert (recent_ids.current == set([3]) and recent_ids.previous == set([1, 2])), \
+            "Generations not rotated at max_ids!"
+    assert (recent_ids.seen(1) is True and recent_ids.seen(2) is True), \
+            "Duplicate in the previous generation not found!"
+
+    # a second rotation forgets 1 and 2
+    assert (recent_ids.seen(4) is False and recent_ids.seen(5) is False), \
+            "New id reported as seen!"
+    assert (recent_ids.previous == set([3, 4]) and recent_ids.current == set([5])), \
+            "Generations not rotated at max_ids!"
+    assert (recent_ids.seen(1) is False), "Id older than two generations found!"
+
+    # rotation after window seconds, before the generation is full
+    recent_ids = RecentIds(0.05, 1000)
+    recent_ids.seen(1)
+    time.sleep(0.1)
+    assert (recent_ids.seen(2) is False), "New id reported as seen!"
+    assert (recent_ids.previous == set([1]) and recent_ids.current == set([2])), \
+            "Generations not rotated after the window!"
+    assert (recent_ids.seen(1) is True), "Duplicate in the previous generation not found!"
+
+    return("Correct rotation returned.")
+
+if __name__ == '__main__':
+    print(test_get_raw_twitter_id())
+    print(test_recent_ids_rotation())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_filter_funcs.py - Tests functions in ../Twitter2Pg_filter_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_filter_funcs import get_alternation, get_word_alternation, TweetFilter, \
+    get_raw_text
+
+
+def test_get_alternation():
+    """
+    Test that the trie built from the terms finds exactly the terms a plain
+    alternation finds, including terms that are prefixes of other terms
+    and terms with regular expression characters.
+    """
+    terms = ['quake', 'earthquake', 'earth', 'temblor', 'sismo', 'sismo?',
+             'c++', 'a.b', 'terremoto']
+    regex = get_alternation(terms)
+    assert (regex.pattern.startswith('(?:') and regex.pattern.count('earth') == 1), \
+            "Common prefixes not shared!"
+
+    for term in terms:
+        m = regex.search('xx ' + term + ' yy')
+        assert (m is not None and m.group(0) == term), \
+                "Term '{}' not found!".format(term)
+
+    for text in ['no match here', 'EARTHQUAKE', 'axb', 'c+', 'sism']:
+        assert (regex.search(text) is None), "Found a term in '{}'!".format(text)
+
+    # a term that ends where a longer one goes on finds the longer one
+    assert (regex.search('an earthquake').group(0) == 'earthquake'), \
+            "Returned incorrect match!"
+
+    regex = get_alternation(['one'])
+    assert (regex.pattern == 'one'), "Returned incorrect pattern for one term!"
+
+    return("Correct alternation returned.")
+
+
+def test_get_word_alternation():
+    """
+    Test that the word alternation only finds the terms as whole words.
+    """
+    regex = get_word_alternation(['quake', 'earth quake'])
+    assert (regex.search('big quake!') is not None), "Word not found!"
+    assert (regex.search('an earth quake') is not None), "Words not found!"
+    assert (regex.search('earthquake') is None), "Found a term inside a word!"
+    assert (regex.search('quakes') is None), "Found a term inside a word!"
+
+    return("Correct word alternation returned.")
+
+
+def test_precheck():
+    """
+    Test that precheck passes the raw tweets that may have a keyword in
+    their text - including escaped non-ASCII and slashes, nested texts,
+    texts with a $ and tweets without a text - and rejects the others.
+    """
+    tweet_filter = TweetFilter(['earthquake', 'sismo', 'terremoto', 'séisme',
+                                'M/s', 'Erdbeben'], False, None)
+
+    def raw(tweet, ensure_ascii=True):
+        return json.dumps(tweet, ensure_ascii=ensure_ascii)
+
+    tweet = {'id_str': '1', 'text': 'big earthquake here'}
+    assert (tweet_filter.precheck(raw(tweet)) is True), "Keyword not found!"
+
+    # the stream escapes non-ASCII characters and forward slashes
+    tweet = {'id_str': '1', 'text': 'un séisme'}
+    assert (tweet_filter.precheck(raw(tweet)) is True), "Escaped keyword not found!"
+    assert (tweet_filter.precheck(raw(tweet, False)) is True), "Keyword not found!"
+    assert (tweet_filter.precheck(raw(tweet).replace('\\u00e9', '\\u00E9')) is True), \
+            "Upper case escape not found!"
+    assert (tweet_filter.precheck('{"text": "12 M\\/s"}') is True), \
+            "Escaped slash not found!"
+
+    # a keyword in a nested text passes, one outside the texts doesn't
+    tweet = {'id_str': '1', 'text': 'RT look',
+             'retweeted_status': {'text': 'sismo fuerte'}}
+    assert (tweet_filter.precheck(raw(tweet)) is True), "Nested keyword not found!"
+    tweet = {'id_str': '1', 'text': 'nothing to see',
+             'user': {'description': 'earthquake fan'}}
+    assert (tweet_filter.precheck(raw(tweet)) is False), "Keyword outside the text passed!"
+
+    # case sensitive, as Twitter matched it
+    tweet = {'id_str': '1', 'text': 'EARTHQUAKE'}
+    assert (tweet_filter.precheck(raw(tweet)) is False), "Returned incorrect result!"
+
+    # an escaped quote doesn't end the text
+    tweet = {'id_str': '1', 'text': 'he said "hi" then terremoto'}
+    assert (tweet_filter.precheck(raw(tweet)) is True), "Text after a quote not searched!"
+
+    # removing the $ can join a keyword, and a tweet without a text is
+    # rejected after decoding
+    tweet = {'id_str': '1', 'text': 'Erd$beben'}
+    assert (tweet_filter.precheck(raw(tweet)) is True), "Text with a $ not passed!"
+    assert (tweet_filter.precheck(raw({'delete': {'id_str': '1'}})) is True), \
+            "Tweet without a text not passed!"
+
+    assert (TweetFilter([], False, None).precheck(raw({'text': 'earthquake'})) is False), \
+            "Tweet passed without keywords!"
+
+    return("Correct precheck returned.")
+
+
+def test_get_raw_text():
+    """
+    Test that the tweet's own text is read from the raw data and
+    unescaped, and that a text in a nested object isn't taken for it.
+    """
+    tweet = {'id_str': '1', 'text': 'un séisme \\o/ "fuerte"\nhoy',
+             'user': {'description': 'x'}}
+    assert (get_raw_text(json.dumps(tweet)) == tweet['text']), "Returned incorrect text!"
+    assert (get_raw_text(json.dumps(tweet, ensure_ascii=False)) == tweet['text']), \
+            "Returned incorrect text!"
+
+    assert (get_raw_text(json.dumps({'delete': {'id_str': '1'}})) is None), \
+            "Returned a text for a tweet without one!"
+
+    data = json.dumps({'id_str': '1', 'retweeted_status': {'text': 'sismo'},
+                       'text': 'RT sismo'})
+    try:
+        get_raw_text(data)
+    except ValueError:
+        return("Correct text returned.")
+    assert (False), "Returned a nested text!"
+
+if __name__ == '__main__':
+    print(test_get_alternation())
+    print(test_get_word_alternation())
+    print(test_precheck())
+    print(test_get_raw_text())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_funcs.py - Tests functions in ../Twitter2Pg_funcs.py for the desired outputs.
+"""
+
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_funcs import get_candidate_info
+
+# the default [CANDIDATE] settings of Twitter2Pg.ini
+FILTER_TERMS = '( RT |@|#|http|[0-9]|song|drill|predict|MundosOpuestos)'
+MAX_WORDS = 7
+
+
+def test_get_candidate_info():
+    """
+    Test that the word count is the number of space separated items, and
+    that a tweet is a candidate only with fewer than max_words words and
+    none of the filter terms, as tedect counts a bin.
+    """
+    candidate_regex = re.compile(FILTER_TERMS)
+
+    word_count, is_candidate = get_candidate_info('earthquake!', candidate_regex, MAX_WORDS)
+    assert (word_count == 1 and is_candidate is True), "Short tweet not a candidate!"
+
+    text = 'did you feel that earthquake just now'
+    word_count, is_candidate = get_candidate_info(text, candidate_regex, MAX_WORDS)
+    assert (word_count == 7 and is_candidate is False), \
+            "Tweet with max_words words is a candidate!"
+
+    text = 'did you feel that earthquake'
+    word_count, is_candidate = get_candidate_info(text, candidate_regex, MAX_WORDS)
+    assert (word_count == 5 and is_candidate is True), "Returned incorrect classification!"
+
+    # two spaces make an empty item, as string_to_array does in SQL
+    word_count, is_candidate = get_candidate_info('big  earthquake', candidate_regex, MAX_WORDS)
+    assert (word_count == 3), "Returned incorrect word count!"
+
+    for text in ['earthquake drill', 'earthquake @usgs', 'M4 earthquake',
+                 'earthquake http://t.co/x', 'ha RT earthquake']:
+        word_count, is_candidate = get_candidate_info(text, candidate_regex, MAX_WORDS)
+        assert (is_candidate is False), "Tweet with a filter term is a candidate!"
+
+    word_count, is_candidate = get_candidate_info('', candidate_regex, MAX_WORDS)
+    assert (word_count == 1 and is_candidate is True), "Empty text not counted as one word!"
+
+    return("Correct classification returned.")
+
+if __name__ == '__main__':
+    print(test_get_candidate_info())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_pool_funcs.py - Tests functions in ../Twitter2Pg_pool_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_pool_funcs import ParsePool
+
+keywords = None
+
+
+def init_process(process_keywords):
+    global keywords
+
+    keywords = process_keywords
+
+
+def classify(payloads):
+    return [data for data in payloads if data in keywords]
+
+
+def test_parse_pool():
+    """
+    Test that the processes classify with the state passed through
+    initargs, and that restart() gives the new processes the new state.
+    """
+    parse_pool = ParsePool(2, init_process, (['quake'],), classify)
+    try:
+        assert (parse_pool.classify(['quake', 'sismo']) == ['quake']), \
+                "Returned incorrect result!"
+        parse_pool.restart((['sismo'],))
+        assert (parse_pool.classify(['quake', 'sismo']) == ['sismo']), \
+                "Restarted processes not given the new state!"
+    finally:
+        parse_pool.stop()
+
+    return("Correct result returned.")
+
+if __name__ == '__main__':
+    print(test_parse_pool())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_queue_funcs.py - Tests functions in ../Twitter2Pg_queue_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_queue_funcs import TweetQueue
+
+
+def test_drop_oldest():
+    """
+    Test that each tweet is classified once, when it's queued, and that a
+    full queue drops the oldest expendable tweet (the oldest tweet if
+    none is).
+    """
+    classified = []
+
+    def is_expendable(data):
+        classified.append(data)
+        return data.startswith('x')
+
+    tweet_queue = TweetQueue(3, 'drop_oldest', is_expendable=is_expendable)
+    for data in ['c1', 'x1', 'c2', 'c3']:
+        tweet_queue.put(data)
+    assert (classified == ['c1', 'x1', 'c2', 'c3']), "Tweets not classified once each!"
+    assert (tweet_queue.get_batch(10) == ['c1', 'c2', 'c3']), \
+            "Oldest expendable tweet not dropped!"
+
+    for data in ['c4', 'c5', 'c6', 'x2']:
+        tweet_queue.put(data)
+    assert (len(classified) == 8), "Tweets classified again when dropping!"
+    assert (tweet_queue.get_batch(10) == ['c5', 'c6', 'x2']), "Oldest tweet not dropped!"
+
+    stats = tweet_queue.get_stats()
+    assert (stats['dropped'] == 2 and stats['put'] == 8), "Returned incorrect stats!"
+
+    # the other policies don't classify
+    classified = []
+    tweet_queue = TweetQueue(3, 'block', is_expendable=is_expendable)
+    tweet_queue.put('x3')
+    assert (classified == [] and tweet_queue.get() == 'x3'), \
+            "Tweet classified without drop_oldest!"
+
+    return("Correct tweets dropped.")
+
+if __name__ == '__main__':
+    print(test_drop_oldest())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_shard_funcs.py - Tests functions in ../Twitter2Pg_shard_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_shard_funcs import parse_shard, get_shard, split_keywords, \
+    get_shard_suffix, add_suffix
+
+KEYWORDS = ['earthquake', 'quake', 'sismo', 'terremoto', 'temblor', 'séisme',
+            'Erdbeben', 'jishin', 'deprem', 'gempa']
+
+
+def test_parse_shard():
+    """
+    Test that i/N is parsed, and that anything else raises ValueError.
+    """
+    assert (parse_shard('1/1') == (1, 1)), "Returned incorrect shard!"
+    assert (parse_shard('2/4') == (2, 4)), "Returned incorrect shard!"
+    assert (parse_shard('12/16') == (12, 16)), "Returned incorrect shard!"
+
+    for text in ['0/4', '5/4', '2', '2/', '/4', '-1/4', '2/4 ', 'a/b', '2:4']:
+        try:
+            parse_shard(text)
+        except ValueError:
+            continue
+        assert (False), "No ValueError for '{}'!".format(text)
+
+    return("Correct shard returned.")
+
+
+def test_split_keywords():
+    """
+    Test that every keyword belongs to exactly one shard (by crc32), and
+    that each shard yields to the keywords of the shards before it.
+    """
+    assert (get_shard('earthquake', 4) == zlib.crc32(b'earthquake') % 4 + 1), \
+            "Returned incorrect shard!"
+
+    num_shards = 3
+    owned = []
+    for index in range(1, num_shards + 1):
+        own, lower = split_keywords(KEYWORDS, index, num_shards)
+        assert (all(get_shard(keyword, num_shards) == index for keyword in own)), \
+                "Keyword in the wrong shard!"
+        assert (sorted(lower) == sorted(owned)), \
+                "Returned incorrect keywords of the lower shards!"
+        owned.extend(own)
+    assert (sorted(owned) == sorted(KEYWORDS)), "Keywords not split into the shards!"
+
+    own, lower = split_keywords(KEYWORDS, 1, 1)
+    assert (own == KEYWORDS and lower == []), "Single shard doesn't own every keyword!"
+
+    assert (add_suffix('Twitter2Pg.log', get_shard_suffix(2, 4)) == 'Twitter2Pg_2of4.log'), \
+            "Returned incorrect name!"
+    assert (add_suffix('Spool', get_shard_suffix(2, 4)) == 'Spool_2of4'), \
+            "Returned incorrect name!"
+
+    return("Correct keywords returned.")
+
+if __name__ == '__main__':
+    print(test_parse_shard())
+    print(test_split_keywords())
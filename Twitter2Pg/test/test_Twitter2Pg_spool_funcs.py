@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_spool_funcs.py - Tests functions in ../Twitter2Pg_spool_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import glob
+import zlib
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_spool_funcs import HEADER, read_segment, Spool
+
+ROWS = [('1001', "(1001, 'earthquake')"),
+        ('1002', "(1002, 'sismo\té')"),
+        ('1003', "(1003, '')")]
+
+
+def make_spool(directory, loaded):
+    """
+    Returns a spool whose load function collects the rows in loaded
+    """
+    def load(rows):
+        loaded.extend(rows)
+        return True
+    return Spool(directory, logging.getLogger('test'), 1 << 20, 0.0, 1.0, load, 2)
+
+
+def test_record_format():
+    """
+    Test that a record is the payload length and crc32 (big-endian), then
+    the utf-8 of 'twitter_id<TAB>values', and that the rows read back.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, [])
+        spool.append(ROWS[:1])
+        spool.stop()
+        segments = glob.glob(os.path.join(directory, 'spool_*.seg'))
+        assert (len(segments) == 1), "Returned incorrect number of segments!"
+        assert (os.path.basename(segments[0]) == 'spool_000000000001.seg'), \
+                "Returned incorrect segment name!"
+
+        with open(segments[0], 'rb') as f:
+            data = f.read()
+        payload = "1001\t(1001, 'earthquake')".encode('utf-8')
+        assert (data == HEADER.pack(len(payload), zlib.crc32(payload)) + payload), \
+                "Returned incorrect record!"
+
+        spool = make_spool(directory, [])
+        spool.append(ROWS[1:])
+        spool.stop()
+        assert (os.path.isfile(os.path.join(directory, 'spool_000000000002.seg'))), \
+                "Sequence not continued from the segments left behind!"
+        rows, clean = read_segment(os.path.join(directory, 'spool_000000000002.seg'))
+        assert (clean is True and rows == ROWS[1:]), "Rows not read back!"
+
+    return("Correct records returned.")
+
+
+def test_torn_tail():
+    """
+    Test that a segment with a torn or corrupt last record returns the
+    rows before it, and that drain loads them and keeps the segment
+    as .bad.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, [])
+        spool.append(ROWS)
+        spool.stop()
+        filespec = os.path.join(directory, 'spool_000000000001.seg')
+        with open(filespec, 'rb') as f:
+            data = f.read()
+
+        # cut inside the last header, inside the last payload, and flip a
+        # byte of the last payload
+        last = data.rindex(b'1003\t') - HEADER.size
+        for damaged in [data[:last + 3], data[:-2],
+                        data[:-1] + bytes([data[-1] ^ 0xff])]:
+            with open(filespec, 'wb') as f:
+                f.write(damaged)
+            rows, clean = read_segment(filespec)
+            assert (clean is False and rows == ROWS[:2]), "Damaged record not detected!"
+
+        loaded = []
+        spool = make_spool(directory, loaded)
+        spool.drain()
+        assert (loaded == ROWS[:2]), "Rows before the damaged record not loaded!"
+        assert (not os.path.isfile(filespec)
+                and os.path.isfile(filespec[:-4] + '.bad')), "Segment not kept as .bad!"
+
+        # an undamaged segment is loaded in batches and deleted
+        spool.append(ROWS)
+        spool.stop()
+        loaded = []
+        spool = make_spool(directory, loaded)
+        spool.drain()
+        assert (loaded == ROWS), "Rows not loaded!"
+        assert (spool.get_segments() == []), "Loaded segment not deleted!"
+
+    return("Correct torn tail handling returned.")
+
+if __name__ == '__main__':
+    print(test_record_format())
+    print(test_torn_tail())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+""" test_Twitter2Pg_translate_funcs.py - Tests functions in ../Twitter2Pg_translate_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import random
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Twitter2Pg_translate_funcs import build_matcher, LocationTranslator
+
+# (english_translation, aliases) in priority order - aliases overlap, and
+# some are inside others
+ROWS = [('San Jose, Costa Rica', 'José,Jose'),
+        ('Mexico', 'México,Mexico,CDMX'),
+        ('New Mexico', 'Nuevo México,Nuevo Mexico'),
+        ('San Juan', 'San Juan,SJ'),
+        ('Jalisco', 'Jal,Guadalajara'),
+        ('Unused', None)]
+
+
+def translate_row_by_row(rows, location_string):
+    """
+    Translates the way the rows used to be tested - one row at a time, in
+    priority order, each alias a substring test
+    """
+    for english_translation, aliases in rows:
+        if aliases is None:
+            continue
+        for alias in aliases.split(","):
+            if alias in location_string:
+                return english_translation
+    return None
+
+
+def test_translate():
+    """
+    Test that the single scan gives the same translation as testing the
+    rows one at a time, including aliases that overlap or contain others.
+    """
+    location_translator = LocationTranslator(None, logging.getLogger('test'), ['es'], 60)
+    location_translator.matchers = {'es': build_matcher(ROWS)}
+
+    assert (location_translator.translate('es', 'Nuevo México') == 'Mexico'), \
+            "Higher priority alias inside another not found!"
+    assert (location_translator.translate('es', 'San Juan de Jalisco') == 'San Juan'), \
+            "Returned incorrect translation!"
+    assert (location_translator.translate('es', 'San José') == 'San Jose, Costa Rica'), \
+            "Returned incorrect translation!"
+    assert (location_translator.translate('es', 'Lima') is None), \
+            "Returned a translation without an alias!"
+    assert (location_translator.translate('fr', 'México') is None), \
+            "Returned a translation for another language!"
+
+    words = ['San', 'Juan', 'José', 'Jose', 'Nuevo', 'México', 'Mexico', 'CDMX',
+             'SJ', 'Jal', 'Guadalajara', 'Lima', 'de', ',', ' ']
+    random.seed(1)
+    for i in range(2000):
+        location_string = ''.join(random.choice(words) for j in range(random.randint(0, 6)))
+        assert (location_translator.translate('es', location_string)
+                == translate_row_by_row(ROWS, location_string)), \
+                "Returned incorrect translation for '{}'!".format(location_string)
+
+    pattern, alias_rows, translations = build_matcher([('Unused', None)])
+    assert (pattern is None), "Returned a pattern without aliases!"
+
+    return("Correct translations returned.")
+
+if __name__ == '__main__':
+    print(test_translate())
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
 import os.path
+import queue
+import atexit
 import configparser
 import logging.handlers
 import urllib.request
@@ -52,7 +54,14 @@ def create_logger(d):
                    when=bkup_inttype,interval=bkup_interval,backupCount=bkup_count)
     file_handler.suffix = bkup_suffix
     file_handler.setFormatter(main_formatter)
-    logger.addHandler(file_handler)
+
+    # written off-thread by a listener - stop_logger() flushes it
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = logging.handlers.QueueListener(log_queue, file_handler)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    atexit.register(stop_logger, logger)
 
     # Set highest message level that will be logged
     level = config.get('SETUP','logging_level')
@@ -66,6 +75,15 @@ def create_logger(d):
 
     return logger
 
+def stop_logger(logger):
+    """
+    Flushes the queued log records and stops the listener thread.
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+            handler.listener.stop()
+
 def get_region_name(lat, lon):
     """
     Return the short version of the FE region name.
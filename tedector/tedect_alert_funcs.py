@@ -3,16 +3,16 @@
 import sys
 import os.path
 import time
-import datetime
 import codecs
 import logging.handlers
 import psycopg2
 import subprocess
-import unidecode
 from collections import Counter
 
 # local objects
 from tedect_geocode_funcs import esri_geocode, esri_reverse_geocode, get_esri_token
+from tedect_data_funcs import get_tweets
+from tedect_timing_funcs import mark_stage
 
 
 """
@@ -213,131 +213,31 @@ def geocode_tweets(conn, access_token, tweet_list):
     return dict_list
 
 
-#######################################################################
-def get_tweets (conn, trigger_time_str, logger, max_words,
-                    filter_terms, sta_length):
-
-    # returns two lists tweet dict dict objects - one for tweets
-    # involved in triggering, and one for the others
-    trig_dict_list = []
-    other_dict_list = []
-
-    # create a cursor object
-    my_cur = conn.cursor()
-
-    # convert sta_length from minutes to seconds
-    window_duration = sta_length * 60
-
-    # the end time of the tweet window is the trigger_time_str
-    end_time = datetime.datetime.strptime(trigger_time_str, "%Y-%m-%d %H:%M:%S")
-    end_time_str = trigger_time_str
-
-    # convert end_time_str into datetime
-    end_time = datetime.datetime.strptime(trigger_time_str, "%Y-%m-%d %H:%M:%S")
-
-    # the start time is 60 seconds prior to the end time
-    # to 60 seconds prior to that (i.e. a one minute window)
-    start_time = end_time - datetime.timedelta(seconds=window_duration)
-    start_time_str = start_time.strftime("%Y-%m-%d %H:%M:%S")
-
-    query = ("SELECT twitter_id,"                                          \
-             " date_created,"                                              \
-             " twitter_date,"                                              \
-             " text,"                                                      \
-             " to_be_geo_located,"                                         \
-             " coalesce(st_y(message.location), 999) as lat,"              \
-             " st_x(message.location) as lon,"                             \
-             " coalesce(location_string, 'None'),"                         \
-             " location_type"                                              \
-             " FROM message"                                               \
-             " WHERE twitter_date >= to_timestamp('"                       \
-             + start_time_str + "', 'YYYY-MM-DD HH24:MI:SS')::timestamp"   \
-             " AND twitter_date <= to_timestamp('"                         \
-             + end_time_str + "', 'YYYY-MM-DD HH24:MI:SS')::timestamp"     \
-             " ORDER BY id DESC;")
-#    print('query: ' + query)
-
-    try:
-        my_cur.execute(query)
-    except Exception as e:
-        log_msg = ("SQL Error {} on {}")
-        log_msg = log_msg.format(e, query)
-        print(log_msg)
-        logger.error(log_msg, exc_info=True)
-        sys.exit(1)
-
-    my_cur.execute(query)
-    results = my_cur.fetchall()
-    for row in results:
-        tweet_dict = {}
-        # process according to whether the tweet was used in a
-        # trigger or not
-        # the criteria for triggering tweets is that max_words
-        # is satisfied and no filter term is present in the text
-        # 1st, determine num_words - use unidecode to remove
-        # emoji/emoticons from txt (they aren't words and shouldn't
-        # be included in the count
-        my_text = unidecode.unidecode(row[3])
-        my_text = my_text.strip()
-        my_words = my_text.split(' ')
-        num_words = len(my_words)
-
-        # scan the text to see if a filter term is there
-        has_filter_term = False
-        for my_word in filter_terms.split('|'):
-            if my_word in my_text:
-                has_filter_term = True
-                break
-
-        # now have enough info to process
-        # the structure of trig_dict_list and other_dict_list differs,
-        # but these elements are in both
-        twitter_date = row[2]
-        twitter_text = row[3]
-        if row[7] is not None:
-            ul = row[7]
-        else:
-            ul = 'No location string'
-            # identify triggering tweets - In addition to the max_words
-            # and filter terms criteria, the location_string has to be there
-            # to be there
-        if num_words <= max_words and has_filter_term is False and ul != 'No location string':
-            tweet_dict['twitter_date'] = twitter_date
-            tweet_dict['text'] = twitter_text
-            tweet_dict['num_words'] = num_words
-            tweet_dict['lat'] = row[5]
-            tweet_dict['lon'] = row[6]
-            tweet_dict['location_string'] = ul
-            tweet_dict['location_type'] = row[8]
-            trig_dict_list.append(tweet_dict)
-        else:
-            # this tweet is other
-            tweet_dict['TIME'] = twitter_date
-            tweet_dict['UL'] = ul
-            tweet_dict['TXT'] = twitter_text
-            other_dict_list.append(tweet_dict)
-
-
-
-    # close the cursor object and return
-    my_cur.close()
-
-    return trig_dict_list, other_dict_list
-
-
 #######################################################################
 
 def alert(conn, trigger_time_str, logger, mail_dict,
-          esri_dict, filter_terms, max_words, sta_length):
-
+          esri_dict, sta_length, region_tag=None, timing=None,
+          read_conn=None, cell=None):
+
+    # region_tag is set for regional (grid cell) detections and is
+    # added to the subject line
+    # cell is the (lat index, lon index, cell_size) of a regional
+    # detection - only the tweets located in the cell are used
+    # timing is the detection's timing dict (see tedect_timing_funcs) -
+    # the time each stage of the alert finishes is marked in it
+    # read_conn is the connection the tweets are read with (a replica's,
+    # see tedect_replica_funcs) - conn is used without it
     log_msg = 'Preparing alert email notification for event triggered: {}'
     log_msg = log_msg.format(trigger_time_str)
     logger.info(log_msg)
 
 
     # get the tweets from the db for the time interval in question
-    trigger_tweets, other_tweets = get_tweets(conn, trigger_time_str, logger,
-                                max_words, filter_terms, sta_length)
+    if read_conn is None:
+        read_conn = conn
+    trigger_tweets, other_tweets = get_tweets(read_conn, trigger_time_str, logger,
+                                sta_length, cell)
+    mark_stage(timing, 'tweets_retrieved')
 
     log_msg = '\tRetrieved {} triggering tweets and {} other tweets'
     log_msg = log_msg.format(len(trigger_tweets), len(other_tweets))
@@ -379,6 +279,7 @@ def alert(conn, trigger_time_str, logger, mail_dict,
         geo_dict = esri_geocode(conn, access_token, region_estimate_dict['most_common'])
         top3_dict = get_top_three_words(geocoded_tweets)
         have_region = True
+    mark_stage(timing, 'geocoded')
 
     log_msg = '\tEstimated location:'
     log_msg = log_msg.format(subject_location)
@@ -394,6 +295,8 @@ def alert(conn, trigger_time_str, logger, mail_dict,
 
     # make the subject line for the email
     subject = subject_location + ' ' + detection_time + ' ' + mail_dict['subject_tag']
+    if region_tag is not None:
+        subject = subject + ' ' + region_tag
 
     # make the email file
     with open(email_filespec, 'w+', encoding='utf-8') as f:
@@ -494,6 +397,7 @@ def alert(conn, trigger_time_str, logger, mail_dict,
     subproc = subprocess.Popen([command], stdout=subprocess.PIPE,
                                 stderr=subprocess.PIPE, shell=True)
     (out, err) = subproc.communicate(timeout=10)    # waits for child proc
+    mark_stage(timing, 'email_sent')
     out = out.decode("utf-8")
     out = str(out)
 
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+import os.path
+import datetime
+import numpy as np
+
+"""
+tedect_baseline_funcs.py - Functions used in tedect to keep a seasonal
+                           (hour-of-week) baseline of the candidate tweet
+                           rate.  The baseline is a running mean and
+                           variance (Welford) of the rate, in counts per
+                           minute, for each of the 168 hours of the week
+                           (UTC).  It can stand in for the LTA in the
+                           characteristic function so the threshold follows
+                           the daily and weekly rhythm of tweet volume.
+"""
+
+# number of time slots - one per hour of the week
+NUM_SLOTS = 7 * 24
+
+
+#######################################################################
+def new_baseline():
+    """
+    Purpose: Creates an empty baseline
+
+    Arguments: None
+
+    Returns: baseline dict - 'n' (samples), 'mean' and 'm2' (sum of
+             squared differences from the mean) arrays, one entry per slot
+             (3 x 168 float64 = about 4 KB)
+    """
+    baseline = {}
+    baseline['n'] = np.zeros(NUM_SLOTS)
+    baseline['mean'] = np.zeros(NUM_SLOTS)
+    baseline['m2'] = np.zeros(NUM_SLOTS)
+
+    return baseline
+
+
+#######################################################################
+def get_slot(when_utc):
+    """
+    Purpose: Gets the hour-of-week slot for a time (Monday 00h UTC is 0)
+
+    Arguments: UTC datetime
+
+    Returns: slot index
+    """
+    return when_utc.weekday() * 24 + when_utc.hour
+
+
+#######################################################################
+def update_baseline(baseline, bin_start_utc, bin_count, bin_length):
+    """
+    Purpose: Adds one bin to the baseline (O(1) Welford update of the
+             bin's slot)
+
+    Arguments: baseline dict, bin start time (UTC datetime), bin count,
+               bin_length (seconds)
+
+    Returns: None
+    """
+    slot = get_slot(bin_start_utc)
+    rate = bin_count * 60.0 / bin_length
+
+    n = baseline['n'][slot] + 1
+    delta = rate - baseline['mean'][slot]
+    baseline['n'][slot] = n
+    baseline['mean'][slot] += delta / n
+    baseline['m2'][slot] += delta * (rate - baseline['mean'][slot])
+
+    return
+
+
+#######################################################################
+def get_baseline(baseline, when_utc):
+    """
+    Purpose: Gets the baseline for the slot holding when_utc
+
+    Arguments: baseline dict, UTC datetime
+
+    Returns: mean rate (counts per minute), standard deviation of the
+             rate, and number of samples in the slot
+    """
+    slot = get_slot(when_utc)
+    n = baseline['n'][slot]
+    std = 0.0
+    if n > 1:
+        std = float(np.sqrt(baseline['m2'][slot] / (n - 1)))
+
+    return float(baseline['mean'][slot]), std, int(n)
+
+
+#######################################################################
+def save_baseline(baseline, filespec):
+    """
+    Purpose: Checkpoints the baseline to disk.  The file is written under
+             a temporary name and renamed, so a crash can't leave a
+             partial checkpoint behind.
+
+    Arguments: baseline dict, file spec (.npz)
+
+    Returns: None
+    """
+    temp_filespec = filespec + '.tmp'
+    with open(temp_filespec, 'wb') as f:
+        np.savez(f, n=baseline['n'], mean=baseline['mean'], m2=baseline['m2'])
+    os.replace(temp_filespec, filespec)
+
+    return
+
+
+#######################################################################
+def load_baseline(filespec):
+    """
+    Purpose: Loads a checkpointed baseline
+
+    Arguments: file spec (.npz)
+
+    Returns: baseline dict (empty if the file doesn't exist)
+    """
+    if not os.path.isfile(filespec):
+        return new_baseline()
+
+    baseline = {}
+    with np.load(filespec) as data:
+        for key in ['n', 'mean', 'm2']:
+            baseline[key] = np.array(data[key], dtype=np.float64)
+
+    return baseline
+
+
+#######################################################################
+def rebuild_baseline(seconds, counts, start_utc, num_bins, bin_length):
+    """
+    Purpose: Reconstructs the baseline from historical per-second candidate
+             counts (the rows of message_counts) in one vectorized pass.
+             The seconds are summed into bins (start, end] the way tedect
+             loads them - bins with no rows count as zero - and the bins
+             are then grouped by slot
+
+    Arguments: array of seconds (numpy datetime64[s]) and array of counts
+               from message_counts, start time (UTC datetime) of the first
+               bin, number of bins, bin_length (seconds)
+
+    Returns: baseline dict
+    """
+    start = np.datetime64(start_utc.replace(microsecond=0), 's')
+    seconds = np.asarray(seconds, dtype='datetime64[s]')
+    counts = np.asarray(counts, dtype=np.float64)
+
+    # sum the seconds into bins
+    offsets = (seconds - start).astype(np.int64)
+    index = -(-offsets // bin_length) - 1
+    keep = (index >= 0) & (index < num_bins)
+    bin_counts = np.bincount(index[keep], weights=counts[keep],
+                             minlength=num_bins)
+    rates = bin_counts * 60.0 / bin_length
+
+    # the slot of each bin's start time - 1970-01-01 was a Thursday
+    # (weekday 3)
+    bin_starts = start + np.arange(num_bins) * np.timedelta64(bin_length, 's')
+    hours = bin_starts.astype('datetime64[h]').astype(np.int64)
+    slots = (((hours // 24) + 3) % 7) * 24 + (hours % 24)
+
+    baseline = new_baseline()
+    n = np.bincount(slots, minlength=NUM_SLOTS).astype(np.float64)
+    total = np.bincount(slots, weights=rates, minlength=NUM_SLOTS)
+    mean = np.divide(total, n, out=np.zeros(NUM_SLOTS), where=(n > 0))
+    # sum of squared differences from each bin's slot mean
+    m2 = np.bincount(slots, weights=(rates - mean[slots]) ** 2,
+                     minlength=NUM_SLOTS)
+    baseline['n'] = n
+    baseline['mean'] = mean
+    baseline['m2'] = m2
+
+    return baseline
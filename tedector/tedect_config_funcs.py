@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+import sys
 import configparser
 
 """
@@ -22,7 +23,9 @@ def validate_config_file(config):
          
     Arguments: handle to config file
 
-    Returns:   setup_dict, logging_dict, db_dict, esri_dict, mail_dict
+    Returns:   setup_dict, logging_dict, db_dict, esri_dict, mail_dict,
+               regional_dict, profile_dict, read_db_dict (empty without
+               a [DATABASE_READ] section)
     """
 
     # initialize the section dictionaries
@@ -31,6 +34,9 @@ def validate_config_file(config):
     db_dict = {}
     esri_dict = {}
     mail_dict = {}
+    regional_dict = {}
+    profile_dict = {}
+    read_db_dict = {}
 
     # define the sections required and make sure they are present
     required_sections = ['SETUP', 'LOGGING', 'DATABASE', 'ESRI', 'MAIL']
@@ -44,8 +50,7 @@ def validate_config_file(config):
     # validate [SETUP] section
     section = 'SETUP'
     keys = ['bin_length', 'lta_length', 'sta_length', 'm', 'b',
-            'detection_threshold', 'trigger_reset', 'filter_terms',
-            'max_words', 'bin_load_delay']
+            'detection_threshold', 'trigger_reset', 'bin_load_delay']
     missing = []
     for key in keys:
         if not config.has_option(section, key):
@@ -61,6 +66,18 @@ def validate_config_file(config):
         print(log_msg)
         sys.exit(1)
 
+    # optional [SETUP] key/value pairs and their defaults
+    # series_batch_size: number of bins written to detector_series at a time
+    # use_seasonal_baseline, baseline_file, baseline_min_samples and
+    # baseline_checkpoint_bins: the hour-of-week baseline (see tedect.ini)
+    optional_keys = {'series_batch_size': '12',
+                     'use_seasonal_baseline': 'False',
+                     'baseline_file': 'tedect_baseline.npz',
+                     'baseline_min_samples': '360',
+                     'baseline_checkpoint_bins': '60'}
+    for key in optional_keys:
+        setup_dict[key] = config.get(section, key, fallback=optional_keys[key])
+
     # Validate the [LOGGING] section to make sure all required key/value
     # pairs are present.  Load the setup_dict along the way
     section = 'LOGGING'
@@ -99,6 +116,36 @@ def validate_config_file(config):
         print(log_msg)
         sys.exit(1)
 
+    # optional [DATABASE] key/value pairs and their defaults
+    # pool_size, statement_timeout_ms, health_check_interval and
+    # max_backoff: the connection pool (see tedect.ini)
+    optional_keys = {'pool_size': '2',
+                     'statement_timeout_ms': '30000',
+                     'health_check_interval': '30',
+                     'max_backoff': '60'}
+    for key in optional_keys:
+        db_dict[key] = config.get(section, key, fallback=optional_keys[key])
+    check_pool_size(section, db_dict['pool_size'])
+
+    # the [DATABASE_READ] section is optional - a streaming replica
+    # for the bin counts, backfill and alert tweets.  The connection
+    # keys it doesn't set are the [DATABASE] ones
+    section = 'DATABASE_READ'
+    if config.has_section(section):
+        optional_keys = {'ip': db_dict['ip'],
+                         'port': db_dict['port'],
+                         'name': db_dict['name'],
+                         'user': db_dict['user'],
+                         'password': db_dict['password'],
+                         'max_lag_fraction': '0.5',
+                         'pool_size': '1',
+                         'statement_timeout_ms': db_dict['statement_timeout_ms'],
+                         'health_check_interval': db_dict['health_check_interval'],
+                         'max_backoff': db_dict['max_backoff']}
+        for key in optional_keys:
+            read_db_dict[key] = config.get(section, key, fallback=optional_keys[key])
+        check_pool_size(section, read_db_dict['pool_size'])
+
     # Validate the [ESRI] section
     section = 'ESRI'
     keys = ['clientId', 'clientSecret']
@@ -135,4 +182,48 @@ def validate_config_file(config):
         print(log_msg)
         sys.exit(1)
 
-    return setup_dict, logging_dict, db_dict, esri_dict, mail_dict
+    # the [REGIONAL] section is optional - any key/value pair that
+    # isn't set gets its default
+    section = 'REGIONAL'
+    optional_keys = {'enabled': 'False',
+                     'cell_size': '1.0',
+                     'm': '2',
+                     'b': '3',
+                     'detection_threshold': '1.0',
+                     'trigger_reset': '0.25'}
+    for key in optional_keys:
+        regional_dict[key] = config.get(section, key, fallback=optional_keys[key])
+
+    # the [PROFILE] section is optional too
+    section = 'PROFILE'
+    optional_keys = {'profiler': 'sampling',
+                     'duration': '30',
+                     'interval_ms': '10'}
+    for key in optional_keys:
+        profile_dict[key] = config.get(section, key, fallback=optional_keys[key])
+
+    return setup_dict, logging_dict, db_dict, esri_dict, mail_dict, regional_dict, \
+           profile_dict, read_db_dict
+
+
+#######################################################################
+def check_pool_size(section, pool_size):
+    """
+    Purpose: Makes sure a pool_size is a whole number of at least 1
+
+    Arguments: section, pool_size (string from the config file)
+
+    Returns: None
+    """
+    try:
+        size = int(pool_size)
+    except ValueError:
+        size = 0
+    if size < 1:
+        log_msg = ("[{}] section of Config file: "
+                   "pool_size must be an integer of at least 1")
+        log_msg = log_msg.format(section)
+        print(log_msg)
+        sys.exit(1)
+
+    return
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+import sys
+import datetime
+
+# local objects
+from tedect_db_funcs import execute_prepared, RETRY_ERRORS
+
+"""
+tedect_data_funcs.py - Functions used in tedect to read the database on the
+                       hot path.  The statements are prepared on the server
+                       once per connection (so postgres doesn't plan every
+                       bin query from scratch) and take their values as
+                       parameters - times are bound as datetimes, and a
+                       quote in a region or country name can't break them
+"""
+
+# the prepared statements, by name ($1, $2, ... are the parameters)
+STATEMENTS = {}
+
+# the candidate tweet count of a bin (start, end]
+STATEMENTS['bin_count_filtered'] = (
+    "SELECT coalesce(sum(count), 0) FROM message_counts"
+    " WHERE second > $1 AND second <= $2")
+
+# the per-second candidate counts of (start, end] - the backfill and the
+# baseline rebuild sum them into bins
+STATEMENTS['second_counts'] = (
+    "SELECT second, count FROM message_counts"
+    " WHERE second > $1 AND second <= $2")
+
+# the candidate tweets with coordinates of a bin (start, end] per grid
+# cell - $1 is cell_size, and a cell is the floor of lat and lon divided
+# by it
+STATEMENTS['regional_bin_counts'] = (
+    "SELECT floor(st_y(location) / $1), floor(st_x(location) / $1), count(*)"
+    " FROM message"
+    " WHERE is_candidate AND location IS NOT NULL"
+    " AND twitter_date > $2 AND twitter_date <= $3"
+    " GROUP BY 1, 2")
+
+# the tweets of the STA window [start, end] ending at a trigger
+TRIGGER_WINDOW_COLUMNS = (
+    "SELECT twitter_id,"
+    " date_created,"
+    " twitter_date,"
+    " text,"
+    " to_be_geo_located,"
+    " coalesce(st_y(message.location), 999) as lat,"
+    " st_x(message.location) as lon,"
+    " coalesce(location_string, 'None'),"
+    " location_type,"
+    " word_count,"
+    " is_candidate"
+    " FROM message"
+    " WHERE twitter_date >= $1 AND twitter_date <= $2")
+
+STATEMENTS['trigger_window_tweets'] = (
+    TRIGGER_WINDOW_COLUMNS +
+    " ORDER BY id DESC")
+
+# the same, for a regional trigger - only the tweets located in the grid
+# cell ($3 is cell_size, $4 and $5 the cell's lat and lon index, as in
+# tedect's regional bin query)
+STATEMENTS['trigger_window_cell_tweets'] = (
+    TRIGGER_WINDOW_COLUMNS +
+    " AND location IS NOT NULL"
+    " AND floor(st_y(location) / $3) = $4"
+    " AND floor(st_x(location) / $3) = $5"
+    " ORDER BY id DESC")
+
+STATEMENTS['state_lookup'] = (
+    "SELECT state, code, aliases FROM states WHERE state = $1")
+
+STATEMENTS['country_lookup'] = (
+    "SELECT common_name, aliases FROM countries WHERE code = $1")
+
+
+#######################################################################
+def get_bin_count_filtered(db, start_utc, end_utc, logger, retries=None):
+    """
+    Purpose: Gets the count of candidate tweets for the date range.
+             Twitter2Pg applies the filter_terms and max_words constraints
+             when it inserts the tweet, and keeps a per-second count of
+             the candidates in the message_counts table, so this sums
+             bin_length rows of that table
+             (NOTE the strict inequality for the start time, which is
+              intentional - it avoids counting tweets twice).
+             A lost connection is waited out - the bin must be loaded
+
+    Arguments: Database object, bin start and end time (UTC datetimes),
+               logger, retries (attempts - with a number, the last
+               connection error is raised instead)
+
+    Returns: integer count
+    """
+    # bins are loaded on whole seconds
+    start_utc = start_utc.replace(microsecond=0)
+    end_utc = end_utc.replace(microsecond=0)
+    try:
+        row = db.execute(STATEMENTS['bin_count_filtered'], (start_utc, end_utc),
+                         fetch='one', name='bin_count_filtered', retries=retries)
+    except RETRY_ERRORS:
+        raise
+    except Exception as e:
+        log_msg = ("SQL Error {} on bin_count_filtered ({}, {}]")
+        log_msg = log_msg.format(e, start_utc, end_utc)
+        print(log_msg)
+        logger.error(log_msg, exc_info=True)
+        sys.exit(1)
+
+    return int(row[0])
+
+
+#######################################################################
+def get_tweets (conn, trigger_time_str, logger, sta_length, cell=None):
+    """
+    Purpose: Gets the tweets of the STA window ending at the trigger time
+             (only those located in the grid cell, for a regional
+             trigger)
+
+    Arguments: db connection object (a pooled connection), trigger time
+               (UTC string), logger, sta_length (minutes), cell (lat
+               index, lon index, cell_size) of a regional trigger, or None
+
+    Returns: two lists of tweet dicts - the tweets involved in
+             triggering, and the others (a lost connection raises one of
+             RETRY_ERRORS - the caller gets a new one and tries again)
+    """
+    trig_dict_list = []
+    other_dict_list = []
+
+    # the window runs sta_length minutes back from the trigger time
+    end_time = datetime.datetime.strptime(trigger_time_str, "%Y-%m-%d %H:%M:%S")
+    start_time = end_time - datetime.timedelta(seconds=(sta_length * 60))
+
+    name = 'trigger_window_tweets'
+    params = (start_time, end_time)
+    if cell is not None:
+        lat_index, lon_index, cell_size = cell
+        name = 'trigger_window_cell_tweets'
+        params = (start_time, end_time, cell_size, lat_index, lon_index)
+
+    my_cur = conn.cursor()
+    try:
+        execute_prepared(my_cur, name, STATEMENTS[name], params)
+        results = my_cur.fetchall()
+    except RETRY_ERRORS:
+        raise
+    except Exception as e:
+        log_msg = ("SQL Error {} on {} {}")
+        log_msg = log_msg.format(e, name, params)
+        print(log_msg)
+        logger.error(log_msg, exc_info=True)
+        sys.exit(1)
+    my_cur.close()
+
+    for row in results:
+        tweet_dict = {}
+        # process according to whether the tweet was used in a
+        # trigger or not
+        # the criteria for triggering tweets is that the tweet was
+        # counted by tedect (max_words is satisfied and no filter term
+        # is present in the text) - Twitter2Pg has already worked that
+        # out and stored it in is_candidate and word_count.  A tweet with
+        # exactly max_words words is not a candidate, as in the bin count
+        num_words = row[9]
+        is_candidate = row[10]
+
+        # the structure of trig_dict_list and other_dict_list differs,
+        # but these elements are in both
+        twitter_date = row[2]
+        twitter_text = row[3]
+        if row[7] is not None:
+            ul = row[7]
+        else:
+            ul = 'No location string'
+        # identify triggering tweets - In addition to the max_words
+        # and filter terms criteria, the location_string has to be there
+        if is_candidate and ul != 'No location string':
+            tweet_dict['twitter_date'] = twitter_date
+            tweet_dict['text'] = twitter_text
+            tweet_dict['num_words'] = num_words
+            tweet_dict['lat'] = row[5]
+            tweet_dict['lon'] = row[6]
+            tweet_dict['location_string'] = ul
+            tweet_dict['location_type'] = row[8]
+            trig_dict_list.append(tweet_dict)
+        else:
+            # this tweet is other
+            tweet_dict['TIME'] = twitter_date
+            tweet_dict['UL'] = ul
+            tweet_dict['TXT'] = twitter_text
+            other_dict_list.append(tweet_dict)
+
+    return trig_dict_list, other_dict_list
+
+
+#######################################################################
+def state_table_lookup(conn, region):
+    """
+    Purpose: Looks up a state or region in the states table
+
+    Arguments: db connection object (a pooled connection), region name
+               (or None)
+
+    Returns: state, state_abbrev, state_aliases ('' when not found)
+             (a lost connection raises one of RETRY_ERRORS, as in
+             get_tweets)
+    """
+    state = ''
+    state_abbrev = ''
+    state_aliases = ''
+
+    if region is not None:
+        state = region
+        my_cur = conn.cursor()
+        try:
+            execute_prepared(my_cur, 'state_lookup', STATEMENTS['state_lookup'],
+                             (region,))
+            row = my_cur.fetchone()
+        except RETRY_ERRORS:
+            raise
+        except Exception as e:
+            log_msg = ("get_state SQL Error {} on state_lookup ({})")
+            log_msg = log_msg.format(e, region)
+            print(log_msg)
+            sys.exit(1)
+        my_cur.close()
+
+        if row is not None:
+            state = row[0]
+            state_abbrev = row[1]
+            state_aliases = row[2]
+        else:
+            print('get_state failed for region = ' + region)
+
+    return state, state_abbrev, state_aliases
+
+
+#######################################################################
+def get_country_common_name_and_aliases(conn, country):
+    """
+    Purpose: ESRI returns abbreviated country, which is not that useful.
+             Looks up the common name and aliases in the countries table
+
+    Arguments: db connection object (a pooled connection), country code
+
+    Returns: common name (the code when not found), aliases (a lost
+             connection raises one of RETRY_ERRORS, as in get_tweets)
+    """
+    country_common_name = country
+    country_aliases = ''
+
+    my_cur = conn.cursor()
+    try:
+        execute_prepared(my_cur, 'country_lookup', STATEMENTS['country_lookup'],
+                         (country,))
+        row = my_cur.fetchone()
+    except RETRY_ERRORS:
+        raise
+    except Exception as e:
+        log_msg = ("process_country SQL Error {} on country_lookup ({})")
+        log_msg = log_msg.format(e, country)
+        print(log_msg)
+        sys.exit(1)
+    my_cur.close()
+
+    if row is not None:
+        country_common_name = row[0]
+        if row[1] is not None:
+            country_aliases = row[1]
+
+    return country_common_name, country_aliases
@@ -6,76 +6,8 @@ import json
 import requests
 import unidecode
 
-####################
-def state_table_lookup(conn, region):
-
-    # create a cursor object
-    my_cur = conn.cursor()
-
-    # returns state, state_abbrev, state_aliases
-    state = ''
-    state_abbrev = ''
-    state_aliases = ''
-
-    if region is not None:
-        state = region
-        query = "SELECT state, code, aliases FROM states WHERE state='" + region + "'";
-
-        try:
-            my_cur.execute(query)
-        except Exception as e:
-            log_msg = ("get_state SQL Error {} on {}")
-            log_msg = log_msg.format(e, query)
-            print(log_msg)
-            logger.error(log_msg, exc_info=True)
-            sys.exit(1)
-
-        row = my_cur.fetchone()
-        if row is not None:
-            state = row[0]
-            state_abbrev = row[1]
-            state_aliases = row[2]
-        else:
-            print('get_state failed for region = ' + region)
-
-    # close the cursor object and return
-    my_cur.close()
-    return state, state_abbrev, state_aliases
-
-
-####################
-def get_country_common_name_and_aliases(conn, country):
-
-    # create a cursor object
-    my_cur = conn.cursor()
-
-    # these two will be returned
-    country_common_name = country
-    country_aliases = ''
-
-    # ESRI returns abbreviated country, which is not that
-    # useful.  Query the countries table to get common_name and aliases
-    query = "SELECT common_name, aliases FROM countries WHERE code='" + country + "'";
-
-    try:
-        my_cur.execute(query)
-    except Exception as e:
-        log_msg = ("process_country SQL Error {} on {}")
-        log_msg = log_msg.format(e, query)
-        print(log_msg)
-        logger.error(log_msg, exc_info=True)
-        sys.exit(1)
-
-    row = my_cur.fetchone()
-    if row is not None:
-        country_common_name = row[0]
-        if row[1] is not None:
-            country_aliases = row[1]
-
-    # close the cursor object and return
-    my_cur.close()
-    return country_common_name, country_aliases
-
+# local objects
+from tedect_data_funcs import state_table_lookup, get_country_common_name_and_aliases
 
 ####################
 def get_esri_response(token, location):
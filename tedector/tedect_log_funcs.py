@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 
 import os.path
+import queue
+import atexit
 import logging.handlers
 from pathlib import Path
 import subprocess
@@ -14,7 +16,8 @@ tedect.py - Functions used in tedect
 #######################################################################
 #######################################################################
 def log_section_dictionary_info(configfile, logger, setup_dict, logging_dict,
-                                db_dict, esri_dict, mail_dict):
+                                db_dict, esri_dict, mail_dict, regional_dict,
+                                profile_dict, read_db_dict):
     """
     Purpose: writes content of config file section dictionary
              to the log file.  
@@ -94,6 +97,38 @@ def log_section_dictionary_info(configfile, logger, setup_dict, logging_dict,
             log_msg = log_msg.format(key, mail_dict[key])
         logger.info(log_msg)
 
+    section = "REGIONAL"
+    log_msg = "  {} section:"
+    log_msg = log_msg.format(section)
+    logger.info(log_msg)
+    for key in regional_dict:
+        log_msg = "    {} = {}"
+        log_msg = log_msg.format(key, regional_dict[key])
+        logger.info(log_msg)
+
+    section = "PROFILE"
+    log_msg = "  {} section:"
+    log_msg = log_msg.format(section)
+    logger.info(log_msg)
+    for key in profile_dict:
+        log_msg = "    {} = {}"
+        log_msg = log_msg.format(key, profile_dict[key])
+        logger.info(log_msg)
+
+    if read_db_dict:
+        section = "DATABASE_READ"
+        log_msg = "  {} section:"
+        log_msg = log_msg.format(section)
+        logger.info(log_msg)
+        for key in read_db_dict:
+            if (key == 'password' ):
+                log_msg = "    {} = **********"
+                log_msg = log_msg.format(key)
+            else:
+                log_msg = "    {} = {}"
+                log_msg = log_msg.format(key, read_db_dict[key])
+            logger.info(log_msg)
+
     return
 
 
@@ -141,7 +176,15 @@ def start_logging(home_dir, logging_dict):
                                                              backupCount = my_backupCount)
     file_handler.suffix = '%Y-%m-%d_%H:%M:%S'
     file_handler.setFormatter(main_formatter)
-    logger.addHandler(file_handler)
+
+    # the detection loop only queues the records, so a slow disk or a
+    # rotation doesn't delay a bin - see stop_logging()
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.listener = logging.handlers.QueueListener(log_queue, file_handler)
+    queue_handler.listener.start()
+    logger.addHandler(queue_handler)
+    atexit.register(stop_logging, logger)
 
     # Set highest message level that will be logged
     level = logging_dict['logging_level']
@@ -163,3 +206,24 @@ def start_logging(home_dir, logging_dict):
 
     return logger
 
+
+#######################################################################
+#######################################################################
+def stop_logging(logger):
+    """
+    Purpose: Writes out the records still queued for the logfile and
+             stops the listener thread started by start_logging.  Called
+             at the end of the run, and at exit in case the run ended
+             with sys.exit (a second call does nothing)
+
+    Arguments: logger returned by start_logging
+
+    Returns: None
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+            handler.listener.stop()
+
+    return
+
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+
+import os
+import re
+import json
+import glob
+import datetime
+import numpy as np
+
+# the export and the loader need the pyarrow package; tedect runs without it
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.compute
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+"""
+tedect_parquet_funcs.py - Functions used in tedect and exportMessages to keep
+                          a columnar copy of the message table for offline
+                          analysis (research on past detections, replays,
+                          parameter studies) without loading the production
+                          database.  The new rows (by id) are exported in
+                          time chunks to Parquet files partitioned by day:
+                            DIR/date=YYYY-MM-DD/message_YYYYMMDDHH_FIRST_LAST.parquet
+                          and loaded as Arrow tables memory-mapped from an
+                          uncompressed Arrow copy of each file, made the
+                          first time it's loaded.
+"""
+
+# the exported columns: name, SQL expression, type.  The PostGIS location
+# is exported as lat and lon
+EXPORT_COLUMNS = [('id', 'id', 'int64'),
+                  ('date_created', 'date_created', 'timestamp'),
+                  ('twitter_id', 'twitter_id', 'int64'),
+                  ('twitter_date', 'twitter_date', 'timestamp'),
+                  ('to_be_geo_located', 'to_be_geo_located', 'bool'),
+                  ('text', 'text', 'string'),
+                  ('location_string', 'location_string', 'string'),
+                  ('opt_location_string', 'opt_location_string', 'string'),
+                  ('orig_location_string', 'orig_location_string', 'string'),
+                  ('location_type', 'location_type', 'string'),
+                  ('lat', 'st_y(location)', 'float64'),
+                  ('lon', 'st_x(location)', 'float64'),
+                  ('in_reply_to_message_id', 'in_reply_to_message_id', 'int64'),
+                  ('lang', 'lang', 'string'),
+                  ('media_display_url', 'media_display_url', 'string'),
+                  ('media_type', 'media_type', 'string'),
+                  ('time_zone', 'time_zone', 'string'),
+                  ('word_count', 'word_count', 'int16'),
+                  ('is_candidate', 'is_candidate', 'bool'),
+                  ('date_inserted', 'date_inserted', 'timestamp')]
+
+PARTITION_FORMAT = 'date=%Y-%m-%d'
+PARTITION_REGEX = re.compile(r'^date=(\d{4}-\d{2}-\d{2})$')
+STATE_FILE = 'export_state.json'
+
+
+#######################################################################
+def get_schema():
+    """
+    Purpose: Creates the Arrow schema of the exported columns
+
+    Arguments: None
+
+    Returns: pyarrow schema
+    """
+    types = {'int16': pyarrow.int16(),
+             'int64': pyarrow.int64(),
+             'float64': pyarrow.float64(),
+             'bool': pyarrow.bool_(),
+             'string': pyarrow.string(),
+             'timestamp': pyarrow.timestamp('us')}
+
+    return pyarrow.schema([(name, types[kind]) for name, expression, kind in EXPORT_COLUMNS])
+
+
+#######################################################################
+def read_state(directory):
+    """
+    Purpose: Reads the export state: the id watermark (the last id
+             exported) and the run in progress, if one didn't finish
+
+    Arguments: export directory
+
+    Returns: state dict ('last_id', 'pending')
+    """
+    state = {'last_id': 0, 'pending': None}
+    filespec = os.path.join(directory, STATE_FILE)
+    if os.path.isfile(filespec):
+        with open(filespec, encoding='utf-8') as f:
+            state.update(json.load(f))
+
+    return state
+
+
+#######################################################################
+def write_state(directory, state):
+    # written to a temporary file and renamed, so a crash leaves the old
+    # state or the new one
+    filespec = os.path.join(directory, STATE_FILE)
+    with open(filespec + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(filespec + '.tmp', filespec)
+
+
+#######################################################################
+def get_run_files(directory, first_id, last_id):
+    """
+    Purpose: Finds the files written by the export of ids first_id to
+             last_id (including unfinished ones and Arrow copies)
+
+    Arguments: export directory, first and last id of the run
+
+    Returns: list of file specs
+    """
+    pattern = 'message_*_{}_{}.*'.format(first_id, last_id)
+    return glob.glob(os.path.join(directory, 'date=*', pattern))
+
+
+#######################################################################
+def get_chunk_start(twitter_date, chunk_hours):
+    # the start of the chunk holding twitter_date - chunks start at
+    # midnight and every chunk_hours after it
+    day = twitter_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    hours = (twitter_date.hour // chunk_hours) * chunk_hours
+    return day + datetime.timedelta(hours=hours)
+
+
+#######################################################################
+def export_chunk(conn, directory, chunk_start, chunk_end, first_id, last_id,
+                 batch_rows, compression):
+    """
+    Purpose: Exports the rows of one time chunk, in id order, through a
+             server-side cursor, batch_rows rows (one Parquet row group)
+             at a time, so the rows are never all in memory
+
+    Arguments: db connection object (not autocommit), export directory,
+               chunk start and end (UTC datetimes), first and last id of
+               the run, batch_rows, Parquet compression
+
+    Returns: number of rows exported
+    """
+    schema = get_schema()
+    partition = os.path.join(directory, chunk_start.strftime(PARTITION_FORMAT))
+    name = 'message_{}_{}_{}.parquet'.format(chunk_start.strftime('%Y%m%d%H'),
+                                             first_id, last_id)
+    filespec = os.path.join(partition, name)
+
+    query = ("SELECT " + ', '.join(expression for name, expression, kind in EXPORT_COLUMNS) +
+             " FROM message"
+             " WHERE twitter_date >= %s AND twitter_date < %s"
+             " AND id >= %s AND id <= %s"
+             " ORDER BY id")
+    cur = conn.cursor(name='export_messages')
+    cur.itersize = batch_rows
+    cur.execute(query, (chunk_start, chunk_end, first_id, last_id))
+
+    num_rows = 0
+    writer = None
+    try:
+        while True:
+            rows = cur.fetchmany(batch_rows)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            arrays = [pyarrow.array(columns[i], type=schema.field(i).type)
+                      for i in range(len(EXPORT_COLUMNS))]
+            if writer is None:
+                if not os.path.isdir(partition):
+                    os.makedirs(partition)
+                writer = pyarrow.parquet.ParquetWriter(filespec + '.tmp', schema,
+                                                       compression=compression)
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            num_rows = num_rows + len(rows)
+    finally:
+        cur.close()
+        conn.commit()
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        os.replace(filespec + '.tmp', filespec)
+
+    return num_rows
+
+
+#######################################################################
+def export_messages(conn, directory, chunk_hours, batch_rows, compression,
+                    settle_seconds, logger):
+    """
+    Purpose: Exports the message rows added since the last export (id
+             above the watermark) to Parquet, one time chunk at a time.
+             The watermark only moves once every chunk is written; the
+             files of a run that didn't finish are removed by the next
+             one, which exports the same rows again
+
+    Arguments: db connection object (not autocommit), export directory,
+               chunk_hours, batch_rows, Parquet compression,
+               settle_seconds (rows inserted more recently than this are
+               left to the next run, so the batches in flight can
+               commit), logger
+
+    Returns: number of rows exported
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    state = read_state(directory)
+    if state['pending'] is not None:
+        first_id, last_id = state['pending']
+        for filespec in get_run_files(directory, first_id, last_id):
+            os.remove(filespec)
+        log_msg = 'removed the files of the unfinished export of ids {} to {}'
+        log_msg = log_msg.format(first_id, last_id)
+        logger.warning(log_msg)
+
+    # a row is visible once its batch commits, which can be after a later
+    # id is.  Only the rows inserted more than settle_seconds ago are
+    # exported, so a batch still in flight (its rows may have lower ids
+    # than rows already committed) is left to the next run instead of
+    # falling below the watermark.  Rows from before date_inserted was
+    # added (NULL) are long settled
+    first_id = state['last_id'] + 1
+    cur = conn.cursor()
+    cur.execute("SELECT max(id) FROM message WHERE id >= %s"
+                " AND (date_inserted IS NULL"
+                " OR date_inserted < localtimestamp - %s * interval '1 second')",
+                (first_id, settle_seconds))
+    last_id = cur.fetchone()[0]
+    conn.commit()
+    if last_id is None:
+        cur.close()
+        log_msg = 'no settled rows since id {}'
+        log_msg = log_msg.format(state['last_id'])
+        logger.info(log_msg)
+        return 0
+
+    cur.execute("SELECT min(twitter_date), max(twitter_date) FROM message"
+                " WHERE id >= %s AND id <= %s", (first_id, last_id))
+    min_date, max_date = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    state['pending'] = [first_id, last_id]
+    write_state(directory, state)
+
+    num_rows = 0
+    if min_date is not None:
+        chunk_start = get_chunk_start(min_date, chunk_hours)
+        while chunk_start <= max_date:
+            chunk_end = chunk_start + datetime.timedelta(hours=chunk_hours)
+            chunk_rows = export_chunk(conn, directory, chunk_start, chunk_end,
+                                      first_id, last_id, batch_rows, compression)
+            if chunk_rows:
+                log_msg = '\t{} rows of {} to {}'
+                log_msg = log_msg.format(chunk_rows, chunk_start, chunk_end)
+                logger.info(log_msg)
+            num_rows = num_rows + chunk_rows
+            chunk_start = chunk_end
+
+    state['last_id'] = last_id
+    state['pending'] = None
+    write_state(directory, state)
+    log_msg = 'exported {} rows (ids {} to {}) to {}'
+    log_msg = log_msg.format(num_rows, first_id, last_id, directory)
+    logger.info(log_msg)
+
+    return num_rows
+
+
+#######################################################################
+def get_arrow_file(filespec):
+    """
+    Purpose: Makes the uncompressed Arrow (IPC) copy of a Parquet file that
+             the loader memory-maps, unless it's already there
+
+    Arguments: Parquet file spec
+
+    Returns: Arrow file spec
+    """
+    arrow_filespec = filespec[:-len('.parquet')] + '.arrow'
+    if (os.path.isfile(arrow_filespec)
+        and os.path.getmtime(arrow_filespec) >= os.path.getmtime(filespec)):
+        return arrow_filespec
+
+    table = pyarrow.parquet.read_table(filespec)
+    with pyarrow.OSFile(arrow_filespec + '.tmp', 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(arrow_filespec + '.tmp', arrow_filespec)
+
+    return arrow_filespec
+
+
+#######################################################################
+def cut_table(table, start_utc, end_utc):
+    """
+    Purpose: Keeps the rows of a table in a twitter_date range.  The rows
+             kept are copied
+
+    Arguments: pyarrow Table (with twitter_date), start and end of the
+               range [start, end) (UTC datetimes, None for no limit)
+
+    Returns: pyarrow Table
+    """
+    twitter_date = table.column('twitter_date')
+    mask = None
+    if start_utc is not None:
+        mask = pyarrow.compute.greater_equal(twitter_date,
+                                             pyarrow.scalar(start_utc, pyarrow.timestamp('us')))
+    if end_utc is not None:
+        before_end = pyarrow.compute.less(twitter_date,
+                                          pyarrow.scalar(end_utc, pyarrow.timestamp('us')))
+        mask = before_end if mask is None else pyarrow.compute.and_(mask, before_end)
+
+    return table.filter(mask)
+
+
+#######################################################################
+def load_messages(directory, start_utc=None, end_utc=None, columns=None):
+    """
+    Purpose: Loads exported messages as one Arrow table.  Only the day
+             partitions overlapping the time range are read, and each
+             file is memory-mapped (see get_arrow_file), so the table's
+             columns are backed by the page cache rather than copied
+             into memory - only the files of the partly covered days are
+             cut to the time range, which copies the rows they keep
+
+    Arguments: export directory, start and end of the twitter_date range
+               [start, end) (UTC datetimes, None for no limit), list of
+               columns (None for all)
+
+    Returns: pyarrow Table, in partition order (id order within a file)
+    """
+    tables = []
+    for partition in sorted(os.listdir(directory)):
+        m = PARTITION_REGEX.match(partition)
+        if m is None:
+            continue
+        day = datetime.datetime.strptime(m.group(1), '%Y-%m-%d')
+        day_end = day + datetime.timedelta(days=1)
+        if (end_utc is not None and day >= end_utc):
+            continue
+        if (start_utc is not None and day_end <= start_utc):
+            continue
+        partly_covered = ((start_utc is not None and day < start_utc)
+                          or (end_utc is not None and day_end > end_utc))
+        for filespec in sorted(glob.glob(os.path.join(directory, partition,
+                                                      'message_*.parquet'))):
+            source = pyarrow.memory_map(get_arrow_file(filespec), 'r')
+            table = pyarrow.ipc.open_file(source).read_all()
+            if partly_covered:
+                table = cut_table(table, start_utc, end_utc)
+            if columns is not None:
+                table = table.select(columns)
+            tables.append(table)
+
+    if not tables:
+        schema = get_schema()
+        if columns is not None:
+            schema = pyarrow.schema([schema.field(name) for name in columns])
+        return schema.empty_table()
+
+    return pyarrow.concat_tables(tables)
+
+
+#######################################################################
+def get_table_bin_counts(table, start_utc, num_bins, bin_length):
+    """
+    Purpose: Counts the candidate tweets of a loaded table into num_bins
+             consecutive bins starting at start_utc, as tedect counts
+             message_counts: a tweet is counted in the second it was
+             created (twitter_date truncated), and a second belongs to
+             the bin (start, end]
+
+    Arguments: pyarrow Table (with twitter_date and is_candidate), start
+               time (UTC datetime) of the first bin, number of bins,
+               bin_length (seconds)
+
+    Returns: numpy array of integer counts, one per bin
+    """
+    is_candidate = table.column('is_candidate').to_numpy()
+    twitter_date = table.column('twitter_date').to_numpy()
+    seconds = twitter_date[is_candidate == True].astype('datetime64[s]')
+    start = np.datetime64(start_utc.replace(microsecond=0), 's')
+    offsets = (seconds - start).astype(np.int64)
+    # the bin index of a second s is ceil((s - start) / bin_length) - 1
+    index = -(-offsets // bin_length) - 1
+    index = index[(index >= 0) & (index < num_bins)]
+
+    return np.bincount(index, minlength=num_bins)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+"""
+tedect_regional_funcs.py - Functions used in tedect for regional detection.
+                           Candidate tweets with coordinates are assigned
+                           to latitude/longitude grid cells, and the
+                           characteristic function is run for every active
+                           cell at once.  Only cells that have seen a tweet
+                           in the last lta_length + sta_length minutes are
+                           kept, so memory scales with the active cells,
+                           not the globe.
+"""
+
+
+#######################################################################
+def new_regional(deque_maxlen):
+    """
+    Purpose: Creates the regional detection state
+
+    Arguments: deque_maxlen - number of bins covering the LTA plus the STA
+
+    Returns: regional dict:
+             'cells' - dict of (lat index, lon index) -> row of 'counts'
+             'keys' - list of the cell for each row in use
+             'counts' - 2-D ring buffer of bin counts, one row per cell
+                        and one column per bin
+             'triggered' - per row, True while the cell is in post-trigger
+                           recovery
+             'pos' - column the next bin goes in (the oldest bin)
+             'num_bins' - bins loaded so far
+    """
+    regional = {}
+    regional['cells'] = {}
+    regional['keys'] = []
+    regional['counts'] = np.zeros((16, deque_maxlen), dtype=np.int32)
+    regional['triggered'] = np.zeros(16, dtype=bool)
+    regional['pos'] = 0
+    regional['num_bins'] = 0
+
+    return regional
+
+
+#######################################################################
+def get_cell_row(regional, cell):
+    """
+    Purpose: Gets the ring buffer row for a cell, adding the cell (and
+             growing the buffer by doubling) if it isn't active
+
+    Arguments: regional dict, cell
+
+    Returns: row index
+    """
+    row = regional['cells'].get(cell)
+    if row is not None:
+        return row
+
+    row = len(regional['keys'])
+    if row == regional['counts'].shape[0]:
+        counts = np.zeros((2 * row, regional['counts'].shape[1]), dtype=np.int32)
+        counts[:row] = regional['counts']
+        triggered = np.zeros(2 * row, dtype=bool)
+        triggered[:row] = regional['triggered']
+        regional['counts'] = counts
+        regional['triggered'] = triggered
+    regional['cells'][cell] = row
+    regional['keys'].append(cell)
+
+    return row
+
+
+#######################################################################
+def add_regional_bin(regional, cell_counts):
+    """
+    Purpose: Adds one bin to the ring buffer.  The column being
+             overwritten (the oldest bin) is cleared for every cell.
+
+    Arguments: regional dict, list of (lat index, lon index, count)
+
+    Returns: None
+    """
+    pos = regional['pos']
+    regional['counts'][:, pos] = 0
+    for lat_index, lon_index, count in cell_counts:
+        row = get_cell_row(regional, (int(lat_index), int(lon_index)))
+        regional['counts'][row, pos] = count
+    regional['pos'] = (pos + 1) % regional['counts'].shape[1]
+    regional['num_bins'] = regional['num_bins'] + 1
+
+    return
+
+
+#######################################################################
+def evict_inactive_cells(regional):
+    """
+    Purpose: Drops the cells with no tweets anywhere in the window (and
+             not in post-trigger recovery) and compacts the buffer to the
+             cells kept
+
+    Arguments: regional dict
+
+    Returns: number of cells dropped
+    """
+    num_rows = len(regional['keys'])
+    counts = regional['counts'][:num_rows]
+    keep = counts.any(axis=1) | regional['triggered'][:num_rows]
+    num_dropped = num_rows - int(keep.sum())
+    if num_dropped == 0:
+        return 0
+
+    # the buffer is sized for the cells kept (the next power of two, as
+    # get_cell_row grows it), so it shrinks again after a burst of cells
+    keep_rows = np.flatnonzero(keep)
+    capacity = 16
+    while capacity < len(keep_rows):
+        capacity = 2 * capacity
+    new_counts = np.zeros((capacity, counts.shape[1]), dtype=np.int32)
+    new_counts[:len(keep_rows)] = counts[keep_rows]
+    new_triggered = np.zeros(capacity, dtype=bool)
+    new_triggered[:len(keep_rows)] = regional['triggered'][keep_rows]
+
+    regional['keys'] = [regional['keys'][row] for row in keep_rows]
+    regional['cells'] = dict((cell, row) for row, cell in enumerate(regional['keys']))
+    regional['counts'] = new_counts
+    regional['triggered'] = new_triggered
+
+    return num_dropped
+
+
+#######################################################################
+def get_regional_characteristic(regional, lta_bins, sta_bins, lta_length,
+                                sta_length, m, b):
+    """
+    Purpose: Calculates the characteristic function
+             C(t) = STA / (mLTA + b) for every active cell in one
+             vectorized operation
+
+    Arguments: regional dict, number of LTA bins, number of STA bins,
+               lta_length and sta_length (minutes), m and b
+
+    Returns: arrays of lta, sta and C(t), one entry per active cell
+             (in the order of regional['keys'])
+    """
+    num_rows = len(regional['keys'])
+    maxlen = regional['counts'].shape[1]
+
+    # columns from oldest to newest - 'pos' is the oldest bin
+    order = (regional['pos'] + np.arange(maxlen)) % maxlen
+    counts = regional['counts'][:num_rows]
+    lta = counts[:, order[:lta_bins]].sum(axis=1) / float(lta_length)
+    sta = counts[:, order[maxlen - sta_bins:]].sum(axis=1) / float(sta_length)
+    characteristic = sta / ((m * lta) + b)
+
+    return lta, sta, characteristic
+
+
+#######################################################################
+def get_cell_center(cell, cell_size):
+    """
+    Purpose: Gets the latitude and longitude of the center of a cell
+
+    Arguments: cell (lat index, lon index), cell size (degrees)
+
+    Returns: lat, lon
+    """
+    lat = (cell[0] + 0.5) * cell_size
+    lon = (cell[1] + 0.5) * cell_size
+
+    return round(lat, 3), round(lon, 3)
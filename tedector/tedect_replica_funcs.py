@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+import contextlib
+
+# local objects
+from tedect_db_funcs import RETRY_ERRORS
+
+"""
+tedect_replica_funcs.py - Functions used in tedect to send its reads (the
+                          bin counts, the backfill and the tweets of an
+                          alert) to a streaming replica ([DATABASE_READ] in
+                          tedect.ini), so its range scans don't compete with
+                          Twitter2Pg's writes on the primary.  A bin read
+                          from a replica that is behind would be short, so
+                          the replica's lag is checked before every read and
+                          the primary is used while the lag is over the
+                          bound, or the replica can't be reached.
+"""
+
+# the replica's replay lag, in seconds.  Nothing to replay (all the WAL
+# received has been replayed) is no lag, even if the primary has been idle
+# since the last transaction.  A server that isn't a standby has no lag
+LAG_QUERY = ("SELECT pg_is_in_recovery(),"
+             " CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+             " ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())"
+             " END")
+
+
+#######################################################################
+def new_replica(read_db, max_lag, logger):
+    """
+    Purpose: Creates the replica routing state
+
+    Arguments: Database object of the replica (None when there isn't one),
+               max_lag (seconds), logger
+
+    Returns: replica dict:
+             'db' - the replica's Database object (or None)
+             'max_lag' - most lag (seconds) at which the replica is read
+             'lag' - lag found by the last check (None if unknown)
+             'in_use' - True while reads go to the replica
+             'reason' - why the primary is used instead (logged once)
+             'num_fallbacks' - reads sent to the primary instead
+             'logger' - logger object
+    """
+    replica = {}
+    replica['db'] = read_db
+    replica['max_lag'] = max_lag
+    replica['lag'] = None
+    replica['in_use'] = None
+    replica['reason'] = None
+    replica['num_fallbacks'] = 0
+    replica['logger'] = logger
+
+    return replica
+
+
+#######################################################################
+def check_replica(replica):
+    """
+    Purpose: Checks the replica's lag and decides if the next read goes
+             to it.  Switches between the replica and the primary are
+             logged
+
+    Arguments: replica dict
+
+    Returns: True if the replica should be read
+    """
+    if replica['db'] is None:
+        return False
+
+    reason = None
+    try:
+        is_standby, lag = replica['db'].execute(LAG_QUERY, fetch='one', retries=1)
+        if not is_standby:
+            lag = 0.0
+        replica['lag'] = None if lag is None else float(lag)
+        if replica['lag'] is None:
+            reason = 'replica has not replayed a transaction yet'
+        elif replica['lag'] > replica['max_lag']:
+            reason = 'replica lag {:.1f} s is over {} s'
+            reason = reason.format(replica['lag'], replica['max_lag'])
+    except RETRY_ERRORS as e:
+        replica['lag'] = None
+        reason = 'replica unreachable ({})'.format(' '.join(str(e).split()))
+
+    set_replica_state(replica, reason)
+
+    return reason is None
+
+
+#######################################################################
+def set_replica_state(replica, reason):
+    """
+    Purpose: Records if reads go to the replica (reason is None) or to
+             the primary (reason says why), logging any change
+
+    Arguments: replica dict, reason
+
+    Returns: None
+    """
+    logger = replica['logger']
+    if reason is None:
+        if replica['in_use'] is not True:
+            log_msg = 'reading from the replica (lag {:.1f} s)'
+            log_msg = log_msg.format(replica['lag'])
+            logger.info(log_msg)
+        replica['in_use'] = True
+        replica['reason'] = None
+    else:
+        replica['num_fallbacks'] = replica['num_fallbacks'] + 1
+        if (replica['in_use'] is not False or replica['reason'] != reason):
+            log_msg = 'reading from the primary - {}'
+            log_msg = log_msg.format(reason)
+            logger.warning(log_msg)
+        replica['in_use'] = False
+        replica['reason'] = reason
+
+    return
+
+
+#######################################################################
+def read(replica, db, function, *args):
+    """
+    Purpose: Runs a read - function(Database object, *args, retries=N) -
+             on the replica when it's usable, and on the primary
+             otherwise.  A replica lost during the read is given up on
+             and the read run on the primary
+
+    Arguments: replica dict, primary Database object, function and its
+               arguments
+
+    Returns: what function returns
+    """
+    if check_replica(replica):
+        try:
+            return function(replica['db'], *args, retries=2)
+        except RETRY_ERRORS as e:
+            reason = 'replica lost during a read ({})'.format(' '.join(str(e).split()))
+            set_replica_state(replica, reason)
+
+    return function(db, *args, retries=None)
+
+
+#######################################################################
+@contextlib.contextmanager
+def read_connection(replica, db, primary_conn=None):
+    """
+    Purpose: Lends a connection for a block of reads ('with
+             read_connection(replica, db) as read_conn:') - the
+             replica's when it's usable, the primary's otherwise.  A
+             caller already holding a primary connection passes it in
+             and it's used for the reads, rather than waiting for a
+             second one (with pool_size = 1 there isn't one)
+
+    Arguments: replica dict, primary Database object, primary connection
+               held by the caller (None to take one from the pool)
+
+    Returns: connection object
+    """
+    read_db = None
+    if check_replica(replica):
+        try:
+            conn = replica['db'].retry(replica['db'].getconn, 2)
+            read_db = replica['db']
+        except RETRY_ERRORS as e:
+            reason = 'replica unreachable ({})'.format(' '.join(str(e).split()))
+            set_replica_state(replica, reason)
+    if (read_db is None and primary_conn is not None):
+        yield primary_conn
+        return
+    if read_db is None:
+        conn = db.retry(db.getconn, None)
+        read_db = db
+    try:
+        yield conn
+    finally:
+        read_db.putconn(conn)
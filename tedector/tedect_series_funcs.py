@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import psycopg2
+
+"""
+tedect_series_funcs.py - Functions used in tedect to persist the detector
+                         time series (count, LTA, STA and C(t) for every
+                         bin) and its 1-minute and 1-hour rollups
+"""
+
+
+#######################################################################
+def add_series_row(series_rows, bin_end_utc, count, lta=None, sta=None,
+                   characteristic=None, triggered=False):
+    """
+    Purpose: Appends one bin to the list of rows waiting to be written
+             to the detector_series table.  lta, sta and characteristic
+             are None until the deques are full.
+
+    Arguments: list of pending rows, bin end time (UTC datetime), bin
+               count, lta, sta, C(t) and whether the bin triggered
+
+    Returns: None
+    """
+    row = {}
+    row['bin_end'] = bin_end_utc.strftime("%Y-%m-%d %H:%M:%S")
+    row['count'] = count
+    row['lta'] = lta
+    row['sta'] = sta
+    row['characteristic'] = characteristic
+    row['triggered'] = triggered
+    series_rows.append(row)
+
+    return
+
+
+#######################################################################
+def sql_value(value):
+    # NULL for values not computed yet
+    if value is None:
+        return 'NULL'
+    return str(value)
+
+
+#######################################################################
+def flush_detector_series(conn, series_rows, logger, max_pending):
+    """
+    Purpose: Writes the pending rows to detector_series and folds them
+             into detector_series_rollup (min/max/mean per minute and
+             per hour) with a single statement, so the two tables can't
+             disagree.  Bins already in detector_series (e.g. after a
+             restart backfill) are skipped and not counted twice.
+             The detector must keep running if the write fails, so the
+             error is logged and the rows are kept for the next flush
+             (the oldest are dropped beyond max_pending rows).
+
+    Arguments: db connection object (autocommit), list of pending rows
+               (emptied on success), logger, max_pending
+
+    Returns: None
+    """
+    if not series_rows:
+        return
+
+    values = []
+    for row in series_rows:
+        value = "('{}'::timestamp, {}, {}, {}, {}, {})"
+        value = value.format(row['bin_end'], row['count'],
+                             sql_value(row['lta']), sql_value(row['sta']),
+                             sql_value(row['characteristic']),
+                             row['triggered'])
+        values.append(value)
+
+    query = ("WITH ins AS ("
+             " INSERT INTO detector_series"
+             " (bin_end, count, lta, sta, characteristic, triggered)"
+             " VALUES " + ', '.join(values) +
+             " ON CONFLICT (bin_end) DO NOTHING"
+             " RETURNING bin_end, count, lta, sta, characteristic, triggered)"
+             " INSERT INTO detector_series_rollup AS t"
+             " (resolution, bucket, num_bins, num_c, count, c_min, c_max,"
+             " c_mean, lta_mean, sta_mean, num_triggers)"
+             " SELECT r.resolution, date_trunc(r.resolution, ins.bin_end),"
+             " count(*), count(ins.characteristic), sum(ins.count),"
+             " min(ins.characteristic), max(ins.characteristic),"
+             " avg(ins.characteristic), avg(ins.lta), avg(ins.sta),"
+             " count(*) FILTER (WHERE ins.triggered)"
+             " FROM ins CROSS JOIN (VALUES ('minute'), ('hour')) AS r(resolution)"
+             " GROUP BY 1, 2"
+             " ON CONFLICT (resolution, bucket) DO UPDATE SET"
+             " num_bins = t.num_bins + EXCLUDED.num_bins,"
+             " num_c = t.num_c + EXCLUDED.num_c,"
+             " count = t.count + EXCLUDED.count,"
+             " c_min = least(t.c_min, EXCLUDED.c_min),"
+             " c_max = greatest(t.c_max, EXCLUDED.c_max),"
+             " c_mean = (coalesce(t.c_mean, 0) * t.num_c"
+             " + coalesce(EXCLUDED.c_mean, 0) * EXCLUDED.num_c)"
+             " / NULLIF(t.num_c + EXCLUDED.num_c, 0),"
+             " lta_mean = (coalesce(t.lta_mean, 0) * t.num_c"
+             " + coalesce(EXCLUDED.lta_mean, 0) * EXCLUDED.num_c)"
+             " / NULLIF(t.num_c + EXCLUDED.num_c, 0),"
+             " sta_mean = (coalesce(t.sta_mean, 0) * t.num_c"
+             " + coalesce(EXCLUDED.sta_mean, 0) * EXCLUDED.num_c)"
+             " / NULLIF(t.num_c + EXCLUDED.num_c, 0),"
+             " num_triggers = t.num_triggers + EXCLUDED.num_triggers")
+    my_cur = conn.cursor()
+    try:
+        my_cur.execute(query)
+        del series_rows[:]
+    except (Exception, psycopg2.DatabaseError) as e:
+        log_msg = 'Error {} writing {} rows to detector_series - will retry'
+        log_msg = log_msg.format(e, len(series_rows))
+        logger.error(log_msg)
+        if len(series_rows) > max_pending:
+            del series_rows[:len(series_rows) - max_pending]
+    my_cur.close()
+
+    return
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+import datetime
+import psycopg2
+
+"""
+tedect_timing_funcs.py - Functions used in tedect to trace the latency of
+                         each detection, from the creation of the tweets
+                         that triggered it to the alert email, and store it
+                         in the detection_timing table
+"""
+
+# the stages tedect and alert() record for a detection, in order.  The
+# stages of each tweet before that come from the message table: twitter_date
+# (created), date_created (received by Twitter2Pg) and date_inserted
+# (written to the database)
+DETECTION_STAGES = ['bin_loaded',
+                    'triggered',
+                    'tweets_retrieved',
+                    'geocoded',
+                    'email_sent']
+
+
+#######################################################################
+def new_timing(trigger_time_str, bin_loaded, region_tag=None, cell=None):
+    """
+    Purpose: Starts the timing of a detection
+
+    Arguments: trigger time (end of the triggering bin, UTC string), time
+               the bin was loaded (UTC datetime), region_tag and cell
+               (lat index, lon index, cell_size) for a regional detection
+
+    Returns: timing dict, with a UTC datetime (or None) for every stage
+    """
+    timing = {}
+    timing['trigger_time'] = trigger_time_str
+    timing['region_tag'] = region_tag
+    timing['cell'] = cell
+    for stage in DETECTION_STAGES:
+        timing[stage] = None
+    timing['bin_loaded'] = bin_loaded
+
+    return timing
+
+
+#######################################################################
+def mark_stage(timing, stage):
+    """
+    Purpose: Records that a stage of the detection finished now.  Does
+             nothing when there is no timing (timing is None)
+
+    Arguments: timing dict, stage (one of DETECTION_STAGES)
+
+    Returns: None
+    """
+    if timing is not None:
+        timing[stage] = datetime.datetime.utcnow()
+
+    return
+
+
+#######################################################################
+def get_seconds(start, end):
+    # seconds from start to end, or 'n/a' if either stage wasn't reached
+    if start is None or end is None:
+        return 'n/a'
+    return round((end - start).total_seconds(), 3)
+
+
+#######################################################################
+def record_detection_timing(conn, timing, sta_length, logger):
+    """
+    Purpose: Writes the stage times of a detection to detection_timing,
+             with the 50th and 90th percentiles and the maximum of each
+             tweet stage over the candidate tweets of the triggering STA
+             window (of the cell, for a regional detection):
+               ingest: date_created - twitter_date
+               store:  date_inserted - date_created
+               wait:   bin_loaded - date_inserted (until the triggering
+                       bin was loaded)
+               total:  email_sent - twitter_date
+             The percentiles are computed by the insert itself, so the
+             tweets aren't read into tedect.  A failure is logged - the
+             detector keeps running.
+
+    Arguments: db connection object (autocommit), timing dict, sta_length
+               (minutes), logger
+
+    Returns: None
+    """
+    end_time = datetime.datetime.strptime(timing['trigger_time'], "%Y-%m-%d %H:%M:%S")
+    start_time = end_time - datetime.timedelta(seconds=(sta_length * 60))
+
+    params = [timing['bin_loaded'], timing['email_sent'], start_time, end_time]
+    cell_filter = ''
+    if timing['cell'] is not None:
+        lat_index, lon_index, cell_size = timing['cell']
+        cell_filter = (" AND location IS NOT NULL"
+                       " AND floor(st_y(location) / %s) = %s"
+                       " AND floor(st_x(location) / %s) = %s")
+        params.extend([cell_size, lat_index, cell_size, lon_index])
+    params.append(end_time)
+    params.append(timing['region_tag'])
+    for stage in DETECTION_STAGES:
+        params.append(timing[stage])
+
+    percentiles = []
+    for name in ['ingest', 'store', 'wait', 'total']:
+        percentile = ("percentile_cont(0.5) WITHIN GROUP (ORDER BY {0}),"
+                      " percentile_cont(0.9) WITHIN GROUP (ORDER BY {0}),"
+                      " max({0})")
+        percentiles.append(percentile.format(name))
+
+    query = ("WITH t AS ("
+             " SELECT twitter_date,"
+             " extract(epoch FROM date_created - twitter_date) AS ingest,"
+             " extract(epoch FROM date_inserted - date_created) AS store,"
+             " extract(epoch FROM %s::timestamp - date_inserted) AS wait,"
+             " extract(epoch FROM %s::timestamp - twitter_date) AS total"
+             " FROM message"
+             " WHERE is_candidate"
+             " AND twitter_date > %s AND twitter_date <= %s" + cell_filter + ")"
+             " INSERT INTO detection_timing (trigger_time, region_tag,"
+             " bin_loaded, triggered, tweets_retrieved, geocoded, email_sent,"
+             " num_tweets, first_tweet,"
+             " ingest_p50, ingest_p90, ingest_max,"
+             " store_p50, store_p90, store_max,"
+             " wait_p50, wait_p90, wait_max,"
+             " total_p50, total_p90, total_max)"
+             " SELECT %s, %s, %s, %s, %s, %s, %s, count(*), min(twitter_date), "
+             + ', '.join(percentiles) +
+             " FROM t"
+             " RETURNING num_tweets, ingest_p50, ingest_p90, store_p90,"
+             " wait_p90, total_p50, total_p90")
+
+    my_cur = conn.cursor()
+    try:
+        my_cur.execute(query, params)
+        row = my_cur.fetchone()
+    except (Exception, psycopg2.DatabaseError) as e:
+        log_msg = 'Error {} writing the timing of the {} detection to detection_timing'
+        log_msg = log_msg.format(e, timing['trigger_time'])
+        logger.error(log_msg)
+        my_cur.close()
+        return
+    my_cur.close()
+
+    # the detection stages, in seconds from the end of the triggering bin
+    log_msg = ('\tTiming: bin loaded +{} s, triggered +{} s, tweets retrieved +{} s,'
+               ' geocoded +{} s, email sent +{} s')
+    log_msg = log_msg.format(*[get_seconds(end_time, timing[stage])
+                               for stage in DETECTION_STAGES])
+    logger.info(log_msg)
+
+    # the tweet stages (seconds, rounded to the millisecond)
+    values = [row[0]] + ['n/a' if value is None else round(value, 3)
+                         for value in row[1:]]
+    log_msg = ('\tTiming of {} tweets: ingest p50 {} p90 {}  store p90 {}'
+               '  wait p90 {}  total p50 {} p90 {}')
+    log_msg = log_msg.format(*values)
+    logger.info(log_msg)
+
+    return
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+""" test_tedect.py - Tests functions in ../tedect for the desired outputs.
+"""
+
+import os
+import sys
+import logging
+import datetime
+import psycopg2
+import importlib.util
+import importlib.machinery
+
+tedector_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, tedector_dir)
+
+# tedect is a script without a .py extension
+loader = importlib.machinery.SourceFileLoader('tedect', os.path.join(tedector_dir, 'tedect'))
+spec = importlib.util.spec_from_loader('tedect', loader)
+tedect = importlib.util.module_from_spec(spec)
+loader.exec_module(tedect)
+tedect.logger = logging.getLogger('test')
+
+
+class SecondCounts(object):
+    """
+    Stands in for the Database object - returns the message_counts rows
+    in the (start, end] range of the second_counts query
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params, fetch=None, name=None, retries=None):
+        start_utc, end_utc = params
+        return [row for row in self.rows if start_utc < row[0] <= end_utc]
+
+
+def test_get_bin_counts():
+    """
+    Test that the per-second counts are summed into the bins (start, end]
+    the way get_bin_count_filtered counts a bin.
+    """
+    start = datetime.datetime(2019, 2, 8, 12, 0, 0)
+    second = datetime.timedelta(seconds=1)
+    rows = [(start, 100),                 # the end of the bin before
+            (start + 1 * second, 1),      # first second of bin 0
+            (start + 5 * second, 2),      # last second of bin 0
+            (start + 6 * second, 4),      # bin 1
+            (start + 15 * second, 8),     # last second of bin 2
+            (start + 16 * second, 100)]   # after the last bin
+    db = SecondCounts(rows)
+
+    counts = tedect.get_bin_counts(db, start, 3, 5)
+    assert (counts == [3, 4, 8]), "Returned incorrect bin counts!"
+
+    # microseconds are dropped - bins are loaded on whole seconds
+    counts = tedect.get_bin_counts(db, start + datetime.timedelta(microseconds=500), 3, 5)
+    assert (counts == [3, 4, 8]), "Returned incorrect bin counts!"
+
+    counts = tedect.get_bin_counts(SecondCounts([]), start, 2, 5)
+    assert (counts == [0, 0]), "Empty bins not counted as zero!"
+
+    return("Correct bin counts returned.")
+
+
+class DatabaseDown(object):
+    """
+    Stands in for the Database object while the database can't be reached
+    """
+
+    def __init__(self):
+        self.retries = []
+
+    def connection(self, retries=5):
+        self.retries.append(retries)
+        raise psycopg2.OperationalError('could not connect to server')
+
+
+def test_flush_series():
+    """
+    Test that a detector_series flush tries for a connection once without
+    waiting, and keeps the newest max_pending rows for the next bin.
+    """
+    db = DatabaseDown()
+    series_rows = list(range(5))
+    tedect.flush_series(db, series_rows, 10)
+    assert (db.retries == [1]), "Connection not tried exactly once!"
+    assert (series_rows == list(range(5))), "Rows not kept for the next bin!"
+
+    series_rows = list(range(15))
+    tedect.flush_series(db, series_rows, 10)
+    assert (series_rows == list(range(5, 15))), "Oldest rows not dropped!"
+
+    return("Correct rows kept.")
+
+if __name__ == '__main__':
+    print(test_get_bin_counts())
+    print(test_flush_series())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+""" test_tedect_baseline_funcs.py - Tests functions in ../tedect_baseline_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tedect_baseline_funcs import new_baseline, get_slot, update_baseline, \
+    get_baseline, rebuild_baseline
+
+
+def test_update_baseline():
+    """
+    Test that the Welford update gives the mean and sample standard
+    deviation of the rates (counts per minute) of a slot.
+    """
+    # Friday 2019-02-08 12:00 UTC
+    start = datetime.datetime(2019, 2, 8, 12, 0, 0)
+    assert (get_slot(start) == 4 * 24 + 12), "Returned incorrect slot!"
+
+    baseline = new_baseline()
+    bin_counts = [3, 0, 7, 2, 10]
+    for i, bin_count in enumerate(bin_counts):
+        update_baseline(baseline, start + datetime.timedelta(seconds=5 * i), bin_count, 5)
+    rates = np.array(bin_counts) * 60.0 / 5
+
+    mean, std, n = get_baseline(baseline, start)
+    assert (n == 5), "Returned incorrect number of samples!"
+    assert (np.isclose(mean, rates.mean())), "Returned incorrect mean!"
+    assert (np.isclose(std, rates.std(ddof=1))), "Returned incorrect standard deviation!"
+
+    # other slots are untouched
+    mean, std, n = get_baseline(baseline, start + datetime.timedelta(hours=1))
+    assert (n == 0 and mean == 0.0 and std == 0.0), "Another slot was updated!"
+
+    return("Correct baseline returned.")
+
+
+def test_rebuild_baseline():
+    """
+    Test that rebuilding from per-second counts gives the baseline the
+    bin by bin Welford update gives, with the seconds summed into bins
+    (start, end] and bins without rows counted as zero.
+    """
+    # the bins cross the end of Sunday into Monday (slot 167 to slot 0)
+    start = datetime.datetime(2019, 2, 10, 23, 59, 40)
+    bin_length = 10
+    num_bins = 6
+    seconds = [start,                                   # before the first bin
+               start + datetime.timedelta(seconds=1),
+               start + datetime.timedelta(seconds=10),
+               start + datetime.timedelta(seconds=11),
+               start + datetime.timedelta(seconds=25),
+               start + datetime.timedelta(seconds=60),
+               start + datetime.timedelta(seconds=61)]  # after the last bin
+    counts = [50, 1, 2, 3, 4, 5, 50]
+    bin_counts = [3, 3, 4, 0, 0, 5]
+
+    expected = new_baseline()
+    for i, bin_count in enumerate(bin_counts):
+        update_baseline(expected, start + datetime.timedelta(seconds=bin_length * i),
+                        bin_count, bin_length)
+
+    baseline = rebuild_baseline(np.array(seconds, dtype='datetime64[s]'), counts,
+                                start, num_bins, bin_length)
+    for key in ['n', 'mean', 'm2']:
+        assert (np.allclose(baseline[key], expected[key])), \
+                "Returned incorrect baseline {}!".format(key)
+    assert (baseline['n'][167] == 2 and baseline['n'][0] == 4), \
+            "Bins assigned to the wrong slots!"
+
+    return("Correct baseline returned.")
+
+if __name__ == '__main__':
+    print(test_update_baseline())
+    print(test_rebuild_baseline())
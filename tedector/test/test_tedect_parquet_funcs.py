@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+""" test_tedect_parquet_funcs.py - Tests functions in ../tedect_parquet_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import datetime
+import tempfile
+import pyarrow
+import pyarrow.parquet
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tedect_parquet_funcs import get_table_bin_counts, get_chunk_start, \
+    get_schema, load_messages
+
+
+def test_get_table_bin_counts():
+    """
+    Test that the candidate tweets are counted in the second they were
+    created, and that a second belongs to the bin (start, end], as tedect
+    counts message_counts.
+    """
+    start = datetime.datetime(2019, 2, 8, 12, 0, 0)
+    offsets = [0.0,     # the end of the bin before
+               0.5,     # second 0 - still the bin before
+               1.0,     # first second of bin 0
+               5.9,     # last second of bin 0
+               6.0,     # bin 1
+               12.0,    # not a candidate
+               15.0,    # last second of bin 2
+               16.0]    # after the last bin
+    is_candidate = [True, True, True, True, True, False, True, True]
+    twitter_date = [start + datetime.timedelta(seconds=offset) for offset in offsets]
+    table = pyarrow.table({'twitter_date': pyarrow.array(twitter_date, pyarrow.timestamp('us')),
+                           'is_candidate': pyarrow.array(is_candidate)})
+
+    counts = get_table_bin_counts(table, start, 3, 5)
+    assert (list(counts) == [2, 1, 1]), "Returned incorrect bin counts!"
+
+    counts = get_table_bin_counts(table.slice(0, 0), start, 2, 5)
+    assert (list(counts) == [0, 0]), "Empty bins not counted as zero!"
+
+    return("Correct bin counts returned.")
+
+
+def test_get_chunk_start():
+    """
+    Test that a time goes in the chunk_hours chunk of its day holding it.
+    """
+    when = datetime.datetime(2019, 2, 8, 13, 45, 10)
+    assert (get_chunk_start(when, 24) == datetime.datetime(2019, 2, 8)), \
+            "Returned incorrect chunk start!"
+    assert (get_chunk_start(when, 6) == datetime.datetime(2019, 2, 8, 12)), \
+            "Returned incorrect chunk start!"
+
+    return("Correct chunk start returned.")
+
+
+def test_load_messages():
+    """
+    Test that only the day partitions overlapping the range are loaded,
+    that the rows are cut to [start, end), and that the files of the days
+    fully inside the range are used as they are (not copied).
+    """
+    schema = get_schema()
+    with tempfile.TemporaryDirectory() as directory:
+        first_id = 1
+        for day in [7, 8, 9, 10]:
+            start = datetime.datetime(2019, 2, day)
+            twitter_date = [start + datetime.timedelta(hours=hour) for hour in [0, 6, 18]]
+            ids = list(range(first_id, first_id + 3))
+            columns = []
+            for field in schema:
+                if field.name == 'id':
+                    columns.append(pyarrow.array(ids, field.type))
+                elif field.name == 'twitter_date':
+                    columns.append(pyarrow.array(twitter_date, field.type))
+                else:
+                    columns.append(pyarrow.nulls(3, field.type))
+            partition = os.path.join(directory, start.strftime('date=%Y-%m-%d'))
+            os.makedirs(partition)
+            filespec = os.path.join(partition, 'message_{}_{}_{}.parquet'.format(
+                start.strftime('%Y%m%d%H'), ids[0], ids[-1]))
+            pyarrow.parquet.write_table(pyarrow.Table.from_arrays(columns, schema=schema),
+                                        filespec)
+            first_id = first_id + 3
+
+        table = load_messages(directory, datetime.datetime(2019, 2, 8, 6),
+                              datetime.datetime(2019, 2, 10, 6), ['id'])
+        assert (table.column('id').to_pylist() == [5, 6, 7, 8, 9, 10]), \
+                "Returned incorrect rows!"
+
+        table = load_messages(directory, datetime.datetime(2019, 2, 9),
+                              datetime.datetime(2019, 2, 10))
+        assert (table.column('id').to_pylist() == [7, 8, 9]), "Returned incorrect rows!"
+        # a memory-mapped buffer is read-only, a copy isn't
+        assert (not table.column('twitter_date').chunk(0).buffers()[1].is_mutable), \
+                "Fully covered day was copied!"
+
+        table = load_messages(directory)
+        assert (table.num_rows == 12), "Returned incorrect number of rows!"
+
+        table = load_messages(directory, datetime.datetime(2019, 3, 1), None, ['id'])
+        assert (table.num_rows == 0 and table.column_names == ['id']), \
+                "Returned rows outside the range!"
+
+    return("Correct messages returned.")
+
+if __name__ == '__main__':
+    print(test_get_table_bin_counts())
+    print(test_get_chunk_start())
+    print(test_load_messages())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+""" test_tedect_regional_funcs.py - Tests functions in ../tedect_regional_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tedect_regional_funcs import new_regional, get_cell_row, add_regional_bin, \
+    evict_inactive_cells, get_regional_characteristic, get_cell_center
+
+
+def test_ring_buffer():
+    """
+    Test that bins go in the ring buffer oldest first, that the oldest bin
+    is cleared for every cell when it is overwritten, and that the LTA and
+    STA are taken from the right bins.
+    """
+    # 4 LTA bins and 2 STA bins
+    regional = new_regional(6)
+    for i in range(6):
+        add_regional_bin(regional, [(10, 20, i + 1)])
+    add_regional_bin(regional, [(10, 20, 7), (11, 20, 1)])
+
+    assert (regional['keys'] == [(10, 20), (11, 20)]), "Returned incorrect cells!"
+    assert (regional['num_bins'] == 7 and regional['pos'] == 1), \
+            "Returned incorrect ring buffer position!"
+    row = regional['cells'][(10, 20)]
+    assert (sorted(regional['counts'][row]) == [2, 3, 4, 5, 6, 7]), \
+            "Oldest bin not overwritten!"
+
+    # bins 2..5 are the LTA (1 minute), 6..7 the STA (0.5 minute)
+    lta, sta, characteristic = get_regional_characteristic(regional, 4, 2, 1.0, 0.5, 1.0, 1.0)
+    assert (np.allclose(lta, [14.0, 0.0])), "Returned incorrect LTA!"
+    assert (np.allclose(sta, [26.0, 2.0])), "Returned incorrect STA!"
+    assert (np.allclose(characteristic, [26.0 / 15.0, 2.0])), "Returned incorrect C(t)!"
+
+    # the new cell has no counts from before it was added
+    add_regional_bin(regional, [])
+    row = regional['cells'][(11, 20)]
+    assert (regional['counts'][row].sum() == 1), "Cleared bin left counts behind!"
+
+    assert (get_cell_center((10, -20), 0.5) == (5.25, -9.75)), "Returned incorrect cell center!"
+
+    return("Correct ring buffer returned.")
+
+
+def test_evict_inactive_cells():
+    """
+    Test that the buffer grows by doubling, and that eviction keeps the
+    active and triggered cells, in order, and shrinks the buffer to the
+    next power of two (at least 16) that holds them.
+    """
+    regional = new_regional(3)
+    add_regional_bin(regional, [(i, 0, 1) for i in range(40)])
+    assert (regional['counts'].shape[0] == 64), "Buffer not grown by doubling!"
+
+    # cells 0..19 stay active, 20 is in post-trigger recovery
+    add_regional_bin(regional, [(i, 0, 1) for i in range(20)])
+    regional['triggered'][regional['cells'][(20, 0)]] = True
+    add_regional_bin(regional, [])
+    add_regional_bin(regional, [])
+
+    num_dropped = evict_inactive_cells(regional)
+    assert (num_dropped == 19), "Returned incorrect number of cells dropped!"
+    assert (regional['keys'] == [(i, 0) for i in range(21)]), "Returned incorrect cells kept!"
+    assert (regional['cells'][(20, 0)] == 20), "Cells not renumbered!"
+    assert (regional['counts'].shape == (32, 3)), "Buffer not sized for the cells kept!"
+    assert (regional['triggered'][20] and not regional['triggered'][:20].any()), \
+            "Trigger state not kept with its cell!"
+    assert (regional['counts'][:20].sum() == 20), "Counts not kept with their cells!"
+
+    assert (evict_inactive_cells(regional) == 0), "Dropped an active cell!"
+
+    # the buffer never shrinks below 16 rows, and grows again from there
+    add_regional_bin(regional, [])
+    add_regional_bin(regional, [])
+    regional['triggered'][:] = False
+    assert (evict_inactive_cells(regional) == 21), "Inactive cells not dropped!"
+    assert (regional['counts'].shape[0] == 16 and regional['keys'] == []), \
+            "Buffer not reset to 16 rows!"
+    assert (get_cell_row(regional, (1, 1)) == 0), "Returned incorrect row!"
+
+    return("Correct eviction returned.")
+
+if __name__ == '__main__':
+    print(test_ring_buffer())
+    print(test_evict_inactive_cells())
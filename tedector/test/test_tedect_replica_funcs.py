@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+""" test_tedect_replica_funcs.py - Tests functions in ../tedect_replica_funcs.py for the desired outputs.
+"""
+
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from tedect_replica_funcs import new_replica, read_connection
+
+
+class Pool(object):
+    """
+    Stands in for the Database object - lends numbered connections and
+    records what is taken and given back
+    """
+
+    def __init__(self):
+        self.lent = []
+        self.returned = []
+
+    def retry(self, function, retries):
+        return function()
+
+    def getconn(self):
+        conn = 'conn{}'.format(len(self.lent) + 1)
+        self.lent.append(conn)
+        return conn
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+def test_read_connection():
+    """
+    Test that without a replica the reads use the primary connection the
+    caller holds, rather than a second one from the pool, and that a
+    connection taken from the pool is given back.
+    """
+    db = Pool()
+    replica = new_replica(None, 2.5, logging.getLogger('test'))
+
+    with read_connection(replica, db, 'held') as read_conn:
+        assert (read_conn == 'held'), "Held connection not used for the reads!"
+    assert (db.lent == [] and db.returned == []), "Second primary connection taken!"
+
+    with read_connection(replica, db) as read_conn:
+        assert (read_conn == 'conn1'), "Returned incorrect connection!"
+    assert (db.returned == ['conn1']), "Connection not given back!"
+
+    return("Correct connection returned.")
+
+if __name__ == '__main__':
+    print(test_read_connection())